@@ -1,12 +1,21 @@
 from dataclasses import dataclass
-from typing import Sequence, Tuple, Set, List
-from .util import EMPTY_HASH, FQ, Word, is_circuit_code
+from typing import Optional, Sequence, Tuple, Set, List
+from .util import (
+    EMPTY_HASH,
+    FQ,
+    KeccakTable,
+    Word,
+    distinct_row_pairs,
+    is_circuit_code,
+    verify_partitions,
+)
 from .evm_circuit import (
     get_push_size,
     BytecodeFieldTag,
     BytecodeTableRow,
     KeccakTableRow,
     KeccakCircuit,
+    BYTECODE_STORE,
 )
 
 
@@ -33,6 +42,12 @@ class UnrolledBytecode:
     rows: Sequence[BytecodeTableRow]
 
 
+def unroll_bytecode(code: bytes) -> UnrolledBytecode:
+    """Unroll a bytecode, reusing the analysis of the same code if there is one"""
+    analysis = BYTECODE_STORE.analyze(code)
+    return UnrolledBytecode(analysis.code, analysis.rows)
+
+
 @is_circuit_code
 def check_bytecode_row(
     cur: Row,
@@ -110,19 +125,32 @@ def assign_bytecode_circuit(
     rows = []
     offset = 0
     for bytecode in bytecodes:
+        # The rows of an analyzed bytecode come with their push data layout and
+        # value rlc, other rows (e.g. modified ones) are assigned byte by byte
+        is_analyzed = False
+        if isinstance(bytecode.rows, tuple):
+            analysis = BYTECODE_STORE.analyze(bytecode.bytes)
+            is_analyzed = bytecode.rows is analysis.rows
+        if is_analyzed:
+            value_rlcs = analysis.value_rlc(keccak_randomness)
         next_push_data_left = 0
         value_rlc = FQ(0)
         for idx, row in enumerate(bytecode.rows):
-            # Subsequent rows represent the bytecode bytes
-            # Track which byte is an opcode and which is push data
-            push_data_left = next_push_data_left
-            is_code = push_data_left == 0
-            push_data_size = 0
-            if idx > 0:
-                push_data_size = get_push_size(row.value)
-                next_push_data_left = push_data_size if is_code else push_data_left - 1
-                # Add the byte to the accumulator
-                value_rlc = value_rlc * keccak_randomness + row.value
+            if is_analyzed:
+                push_data_left = analysis.push_data_left[idx]
+                push_data_size = analysis.push_data_size[idx]
+                value_rlc = value_rlcs[idx]
+            else:
+                # Subsequent rows represent the bytecode bytes
+                # Track which byte is an opcode and which is push data
+                push_data_left = next_push_data_left
+                is_code = push_data_left == 0
+                push_data_size = 0
+                if idx > 0:
+                    push_data_size = get_push_size(row.value)
+                    next_push_data_left = push_data_size if is_code else push_data_left - 1
+                    # Add the byte to the accumulator
+                    value_rlc = value_rlc * keccak_randomness + row.value
 
             # Set the data for this row
             rows.append(
@@ -146,27 +174,101 @@ def assign_bytecode_circuit(
             if offset == 2**k:
                 return rows
 
-    # Padding
-    for idx in range(offset, 2**k):
-        rows.append(
-            Row(
-                q_first=FQ(idx == 0),
-                q_last=FQ(idx == last_row_offset),
-                hash=Word(EMPTY_HASH),
-                tag=FQ(BytecodeFieldTag.Header),
-                index=FQ(0),
-                value=FQ(0),
-                is_code=FQ(False),
-                push_data_left=FQ(0),
-                value_rlc=FQ(0),
-                length=FQ(0),
-                push_data_size=FQ(0),
-            )
-        )
+    # Padding is a run of the same row, only the rows at the boundaries of the
+    # circuit differ in q_first and q_last
+    padding = [padding_row(False, False)] * (2**k - offset)
+    if offset == 0:
+        padding[0] = padding_row(True, last_row_offset == 0)
+    padding[-1] = padding_row(last_row_offset == 0, True)
+    rows.extend(padding)
 
     return rows
 
 
+def padding_row(q_first: bool, q_last: bool) -> Row:
+    return Row(
+        q_first=FQ(q_first),
+        q_last=FQ(q_last),
+        hash=Word(EMPTY_HASH),
+        tag=FQ(BytecodeFieldTag.Header),
+        index=FQ(0),
+        value=FQ(0),
+        is_code=FQ(False),
+        push_data_left=FQ(0),
+        value_rlc=FQ(0),
+        length=FQ(0),
+        push_data_size=FQ(0),
+    )
+
+
+def verify_circuit(
+    rows: Sequence[Row],
+    push_table: Set[Tuple[int, int]],
+    keccak_table: Set[KeccakTableRow],
+    keccak_randomness: FQ,
+):
+    """
+    Verify each row of the circuit against the next one (the last row wraps to
+    the first).  A pair of rows is only checked once when it repeats, so a run
+    of shared padding rows costs a single check.
+    """
+    if len(rows) == 0:
+        return
+    _verify_rows([*rows, rows[0]], push_table, keccak_table, keccak_randomness)
+
+
+def verify_circuit_parallel(
+    rows: Sequence[Row],
+    push_table: Set[Tuple[int, int]],
+    keccak_table: Set[KeccakTableRow],
+    keccak_randomness: FQ,
+    max_workers: Optional[int] = None,
+    min_partition_size: int = 2**10,
+    max_partition_size: int = 2**14,
+):
+    """
+    Verify all the rows of the circuit like `verify_circuit`, splitting them
+    into partitions that are verified concurrently in a process pool.
+
+    Rows are split at the Header row of a bytecode once a partition holds
+    `min_partition_size` rows, and bytecodes longer than `max_partition_size`
+    are split further.  Each partition is sent with the first row of the next
+    one, so the transitions between partitions are checked as well.  The
+    tables are sent once to each worker.
+    """
+    n = len(rows)
+    if n == 0:
+        return
+    bounds = [0]
+    for idx in range(1, n):
+        size = idx - bounds[-1]
+        if (rows[idx].tag == BytecodeFieldTag.Header and size >= min_partition_size) or (
+            size >= max_partition_size
+        ):
+            bounds.append(idx)
+    bounds.append(n)
+
+    # The last row of a partition is the first row of the next one, and is
+    # only used as the next row
+    verify_partitions(
+        _verify_rows,
+        ([*rows[start:end], rows[end % n]] for start, end in zip(bounds, bounds[1:])),
+        (push_table, keccak_table, keccak_randomness),
+        max_workers,
+    )
+
+
+def _verify_rows(
+    rows: Sequence[Row],
+    push_table: Set[Tuple[int, int]],
+    keccak_table: Set[KeccakTableRow],
+    keccak_randomness: FQ,
+):
+    # Check each row but the last one against the next one
+    for row, next_row in distinct_row_pairs(rows):
+        check_bytecode_row(row, next_row, push_table, keccak_table, keccak_randomness)
+
+
 # Generate the push table: BYTE -> NUM_PUSHED:
 # [0, OpcodeId::PUSH1] -> 0
 # [OpcodeId::PUSH1, OpcodeId::PUSH32] -> [1..32]
@@ -179,8 +281,12 @@ def assign_push_table() -> List[Tuple[FQ, FQ]]:
 
 
 # Generate keccak table with row = [input_rlc, input_len, output]
-def assign_keccak_table(bytecodes: Sequence[bytes], keccak_randomness: FQ) -> Set[KeccakTableRow]:
-    keccak_circuit = KeccakCircuit()
+def assign_keccak_table(
+    bytecodes: Sequence[bytes],
+    keccak_randomness: FQ,
+    keccak_table: Optional[KeccakTable] = None,
+) -> Set[KeccakTableRow]:
+    keccak_circuit = KeccakCircuit(keccak_table)
     for bytecode in bytecodes:
         keccak_circuit.add(bytecode, keccak_randomness)
     return set(keccak_circuit.rows)
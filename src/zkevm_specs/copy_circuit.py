@@ -1,4 +1,4 @@
-from typing import Sequence
+from typing import Dict, List, Sequence, Tuple
 
 from .util import FQ, Expression, ConstraintSystem, cast_expr, MAX_N_BYTES, N_BYTES_MEMORY_ADDRESS
 from .evm_circuit import (
@@ -8,8 +8,6 @@ from .evm_circuit import (
     RW,
     Target,
     CopyCircuit,
-    TxContextFieldTag,
-    BytecodeFieldTag,
 )
 
 
@@ -93,6 +91,7 @@ def verify_copy_table(copy_circuit: CopyCircuit, tables: Tables, r: FQ):
     cs = ConstraintSystem()
     copy_table = copy_circuit.table()
     n = len(copy_table)
+    runs: Dict[int, List[CopyCircuitRow]] = {}
     for i, row in enumerate(copy_table):
         rows = [
             row,
@@ -103,28 +102,70 @@ def verify_copy_table(copy_circuit: CopyCircuit, tables: Tables, r: FQ):
         verify_row(cs, rows)
         verify_step(cs, rows, r)
 
-        # lookup into tables
-        if row.is_memory == 1 and row.is_pad == 0:
-            val = tables.rw_lookup(
-                row.rw_counter, 1 - row.q_step, FQ(Target.Memory), row.id.value(), row.addr
-            ).value.value()
-            cs.constrain_equal(val, row.value)
-        if row.is_bytecode == 1 and row.is_pad == 0:
-            val = tables.bytecode_lookup(
-                row.id, FQ(BytecodeFieldTag.Byte), row.addr, row.is_code
-            ).value
-            cs.constrain_equal(cast_expr(val, FQ), row.value)
-        if row.is_tx_calldata == 1 and row.is_pad == 0:
-            val = tables.tx_lookup(
-                row.id.value(), FQ(TxContextFieldTag.CallData), row.addr
-            ).value.value()
-            cs.constrain_equal(val, row.value)
-        if row.is_tx_log == 1:
-            val = tables.rw_lookup(
-                row.rw_counter,
-                FQ(RW.Write),
-                FQ(Target.TxLog),
-                row.id.value(),  # tx_id
-                row.addr,
-            ).value.value()
-            cs.constrain_equal(val, row.value)
+        # the rows of a copy event that read or write a table are looked up
+        # as one contiguous run per side (q_step) once the event is over
+        if row.is_tx_log == 1 or (
+            row.is_pad == 0
+            and (row.is_memory == 1 or row.is_bytecode == 1 or row.is_tx_calldata == 1)
+        ):
+            runs.setdefault(row.q_step.n, []).append(row)
+        if row.is_last == 1 or i == n - 1:
+            for run in runs.values():
+                verify_lookups(cs, run, tables)
+            runs = {}
+
+
+def verify_lookups(cs: ConstraintSystem, rows: Sequence[CopyCircuitRow], tables: Tables):
+    """
+    Look up the bytes of one side of a copy event with a range lookup.  The
+    id, tag and consecutive addresses of the rows are constrained by
+    verify_row, so the range is given by the first row.
+    """
+    first = rows[0]
+    if first.is_memory == 1 or first.is_tx_log == 1:
+        rw = FQ(RW.Write) if first.is_tx_log == 1 else 1 - first.q_step
+        tag = FQ(Target.TxLog) if first.is_tx_log == 1 else FQ(Target.Memory)
+        for run, rw_counter_step in _rw_counter_runs(rows):
+            vals = tables.rw_range_lookup(
+                run[0].rw_counter,
+                rw,
+                tag,
+                first.id.value(),  # call_id or tx_id
+                run[0].addr,
+                len(run),
+                rw_counter_step,
+            )
+            for row, val in zip(run, vals):
+                cs.constrain_equal(val.rw_counter, row.rw_counter)
+                cs.constrain_equal(val.address, row.addr)
+                cs.constrain_equal(val.value.value(), row.value)
+    elif first.is_bytecode == 1:
+        vals = tables.bytecode_range_lookup(first.id, first.addr, len(rows))
+        for row, val in zip(rows, vals):
+            cs.constrain_equal(val.index, row.addr)
+            cs.constrain_equal(val.is_code, row.is_code)
+            cs.constrain_equal(cast_expr(val.value, FQ), row.value)
+    elif first.is_tx_calldata == 1:
+        vals = tables.tx_calldata_range_lookup(first.id.value(), first.addr, len(rows))
+        for row, val in zip(rows, vals):
+            cs.constrain_equal(val.call_data_index_or_zero, row.addr)
+            cs.constrain_equal(val.value.value(), row.value)
+
+
+def _rw_counter_runs(rows: Sequence[CopyCircuitRow]) -> List[Tuple[List[CopyCircuitRow], int]]:
+    # The reads and writes of a copy interleave, so the rw_counter of a side
+    # goes up by 2 while both sides access the rw table and by 1 otherwise,
+    # e.g. when writing the padding.  Split the rows into runs of the same
+    # rw_counter step.
+    runs: List[Tuple[List[CopyCircuitRow], int]] = []
+    for row in rows:
+        if len(runs) > 0:
+            run, step = runs[-1]
+            diff = (row.rw_counter - run[-1].rw_counter).n
+            if len(run) == 1:
+                runs[-1] = (run, diff)
+            if len(run) == 1 or diff == step:
+                run.append(row)
+                continue
+        runs.append(([row], 1))
+    return runs
@@ -1,11 +1,20 @@
 from __future__ import annotations
 from typing import List, NamedTuple, Tuple
-from py_ecc.bn128.bn128_curve import is_on_curve, b, b2, multiply
 from py_ecc.bn128 import bn128_curve
 
 from zkevm_specs.util.arithmetic import FP, RLC
 from .evm_circuit import EccTableRow
-from .util import ConstraintSystem, FQ, Word, ECCVerifyChip, ECCPairingVerifyChip
+from .util import (
+    ConstraintSystem,
+    FQ,
+    Word,
+    ECCVerifyChip,
+    ECCPairingVerifyChip,
+    G1Point,
+    G2Point,
+    is_valid_g1,
+    is_valid_g2,
+)
 from zkevm_specs.evm_circuit.table import EccOpTag
 
 
@@ -31,6 +40,15 @@ class EccCircuitRow:
     def check_fq(cls, value: int) -> bool:
         return value < int(FP.field_modulus)
 
+    @classmethod
+    def g1_point(cls, p: Tuple[Word, Word]) -> G1Point:
+        return (FP(p[0].int_value()).n, FP(p[1].int_value()).n)
+
+    @classmethod
+    def g2_point(cls, q: Tuple[bn128_curve.FQ2, bn128_curve.FQ2]) -> G2Point:
+        x, y = q
+        return ((x.coeffs[0].n, x.coeffs[1].n), (y.coeffs[0].n, y.coeffs[1].n))
+
     @classmethod
     def assign(
         cls,
@@ -56,19 +74,7 @@ class EccCircuitRow:
         # We use (0, 0) to represent an infinite point in the circuit
         # and there is no way to represent as `None` in the circuit
         # (values in Halo2 cell should be a FQ so `None` is impossible).
-        # However, `None` represents a infinite point in `is_on_curve`.
-        # Therefore, we have the following type conversion.
-        point0 = (
-            None
-            if p0[0].int_value() == 0 and p0[1].int_value() == 0
-            else (FP(p0[0].int_value()), FP(p0[1].int_value()))
-        )
-        point1 = (
-            None
-            if p1[0].int_value() == 0 and p1[1].int_value() == 0
-            else (FP(p1[0].int_value()), FP(p1[1].int_value()))
-        )
-        is_valid_points = is_on_curve(point0, b) and is_on_curve(point1, b)
+        is_valid_points = is_valid_g1(cls.g1_point(p0)) and is_valid_g1(cls.g1_point(p1))
 
         is_valid = (
             precheck_p0x and precheck_p0y and precheck_p1x and precheck_p1y and is_valid_points
@@ -105,12 +111,7 @@ class EccCircuitRow:
         precheck_py = cls.check_fq(p0[1].int_value())
 
         # (0, 0) represents an infinite point
-        point0 = (
-            None
-            if p0[0].int_value() == 0 and p0[1].int_value() == 0
-            else (FP(p0[0].int_value()), FP(p0[1].int_value()))
-        )
-        is_valid_point = is_on_curve(point0, b)
+        is_valid_point = is_valid_g1(cls.g1_point(p0))
 
         # Scalar is stored in the first 32 bytes of p1 so the second part of p1 (aka. p[1]) is zero
         # Besides, there is no limit on scalar `s` which means it can be larger than FP.field_modulus
@@ -176,19 +177,11 @@ class EccCircuitRow:
             precheck_qy2 = cls.check_fq(q_y2)
 
             # 2. p0 on G1, and p1 and p2 on G2 are all on the curve
-            # (0, 0) represents an infinite point in the circuit
-            point1_g1 = None if p_x == 0 and p_y == 0 else p_g1
-            point2_g2 = None if q_x1 == 0 and q_x2 == 0 and q_y1 == 0 and q_y2 == 0 else q_g2
-
-            # 3.point * curve order == infinity
+            # 3. and in the subgroup, as point * curve order == infinity
             # ref: https://github.com/ethereum/execution-specs/blob/master/src/ethereum/paris/vm/precompiled_contracts/alt_bn128.py#L142-L149
-            result = multiply(point1_g1, bn128_curve.curve_order)
-            valid_p = True if result is None else False
-            result = multiply(point2_g2, bn128_curve.curve_order)
-            valid_q = True if result is None else False
-
-            is_valid_points = (
-                is_on_curve(point1_g1, b) and is_on_curve(point2_g2, b2) and valid_p and valid_q
+            # (0, 0) represents an infinite point in the circuit
+            is_valid_points = is_valid_g1((p_g1[0].n, p_g1[1].n)) and is_valid_g2(
+                cls.g2_point(q_g2)
             )
 
             is_valid = is_valid and (
@@ -306,13 +299,10 @@ class EccCircuitRow:
         num_of_pairings = 0
         input_bytes = bytearray(b"")
         for p, q in zip(self.ecc_pairing_chip.p, self.ecc_pairing_chip.q):
-            pp = None if p[0].n == 0 and p[1].n == 0 else (p[0], p[1])
-            pq = None if q[0].coeffs == (0, 0) and q[1].coeffs == (0, 0) else (q[0], q[1])
-            # point * curve order == infinity
-            result = multiply(pp, bn128_curve.curve_order)
-            valid_p = FQ.one() if result is None else FQ.zero()
-            result = multiply(pq, bn128_curve.curve_order)
-            valid_q = FQ.one() if result is None else FQ.zero()
+            # points are in G1 and G2, which was already checked when they
+            # were assigned
+            valid_p = FQ(is_valid_g1((p[0].n, p[1].n)))
+            valid_q = FQ(is_valid_g2(self.g2_point(q)))
             cs.constrain_equal(valid_p + valid_q, FQ(2))
 
             # concatenate input points for rlc
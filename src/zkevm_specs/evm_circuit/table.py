@@ -1,5 +1,18 @@
 from __future__ import annotations
-from typing import Any, List, Mapping, Optional, Sequence, Set, Tuple, Type, TypeVar, Union
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 from enum import IntEnum, auto
 from itertools import chain, product
 from dataclasses import dataclass, field, fields
@@ -583,9 +596,15 @@ class Tables:
     fixed_table = set(chain(*[tag.table_assignments() for tag in list(FixedTableTag)]))
     block_table: Set[BlockTableRow]
     tx_table: Set[TxTableRow]
+    # (tx_id, field_tag, call_data_index_or_zero) -> rows
+    tx_index: Dict[Tuple[int, int, int], List[TxTableRow]]
     withdrawal_table: Set[WithdrawalTableRow]
     bytecode_table: Set[BytecodeTableRow]
+    # (bytecode_hash.lo, bytecode_hash.hi, field_tag, index) -> rows
+    bytecode_index: Dict[Tuple[int, int, int, int], List[BytecodeTableRow]]
     rw_table: Set[RWTableRow]
+    # rw_counter -> rows
+    rw_index: Dict[int, List[RWTableRow]]
     copy_table: Set[CopyTableRow]
     keccak_table: Set[KeccakTableRow]
     exp_table: Set[ExpTableRow]
@@ -607,12 +626,23 @@ class Tables:
     ) -> None:
         self.block_table = block_table
         self.tx_table = tx_table
+        self.tx_index = {}
+        for row in tx_table:
+            key = self._tx_key(row.tx_id, row.field_tag, row.call_data_index_or_zero)
+            self.tx_index.setdefault(key, []).append(row)
         self.withdrawal_table = withdrawal_table
         self.bytecode_table = bytecode_table
+        self.bytecode_index = {}
+        for row in bytecode_table:
+            key = self._bytecode_key(row.bytecode_hash, row.field_tag, row.index)
+            self.bytecode_index.setdefault(key, []).append(row)
         self.rw_table = set(
             row if isinstance(row, RWTableRow) else RWTableRow(*row)  # type: ignore  # (RWTableRow input args)
             for row in rw_table
         )
+        self.rw_index = {}
+        for row in self.rw_table:
+            self.rw_index.setdefault(row.rw_counter.expr().n, []).append(row)
         if copy_circuit is not None:
             self.copy_table = self._convert_copy_circuit_to_table(copy_circuit)
         if keccak_table is not None:
@@ -653,7 +683,12 @@ class Tables:
 
     def _convert_exp_circuit_to_table(self, exp_circuit: Sequence[ExpCircuitRow]):
         rows: List[ExpTableRow] = []
-        for i, row in enumerate(exp_circuit):
+        prev_row = None
+        for row in exp_circuit:
+            # a run of shared (dummy) rows maps to the same table row
+            if row is prev_row:
+                continue
+            prev_row = row
             base_limbs = row.base.to_64s()
             rows.append(
                 ExpTableRow(
@@ -702,7 +737,34 @@ class Tables:
             "field_tag": field_tag,
             "call_data_index_or_zero": call_data_index,
         }
-        return lookup(TxTableRow, self.tx_table, query)
+        candidates = self.tx_index.get(self._tx_key(tx_id, field_tag, call_data_index), [])
+        return lookup(TxTableRow, candidates, query)
+
+    def tx_calldata_range_lookup(
+        self, tx_id: Expression, call_data_index_start: Expression, length: int
+    ) -> List[TxTableRow]:
+        """
+        Look up the calldata bytes of a tx at the `length` consecutive indexes
+        from `call_data_index_start`, e.g. the bytes read by a copy event.
+        """
+        field_tag = FQ(TxContextFieldTag.CallData)
+        rows = []
+        for i in range(length):
+            call_data_index = call_data_index_start.expr() + i
+            query = {
+                "tx_id": tx_id,
+                "field_tag": field_tag,
+                "call_data_index_or_zero": call_data_index,
+            }
+            candidates = self.tx_index.get(self._tx_key(tx_id, field_tag, call_data_index), [])
+            rows.append(lookup(TxTableRow, candidates, query))
+        return rows
+
+    @staticmethod
+    def _tx_key(
+        tx_id: Expression, field_tag: Expression, call_data_index: Expression
+    ) -> Tuple[int, int, int]:
+        return (tx_id.expr().n, field_tag.expr().n, call_data_index.expr().n)
 
     def withdrawal_lookup(
         self, id: Expression, validator_id: Expression, address: Word, amount: Expression
@@ -728,7 +790,44 @@ class Tables:
             "index": index,
             "is_code": is_code,
         }
-        return lookup(BytecodeTableRow, self.bytecode_table, query)
+        # Only the rows at the same position of the same bytecode can match
+        candidates = self.bytecode_index.get(
+            self._bytecode_key(bytecode_hash, field_tag, index), []
+        )
+        return lookup(BytecodeTableRow, candidates, query)
+
+    def bytecode_range_lookup(
+        self, bytecode_hash: Word, index_start: Expression, length: int
+    ) -> List[BytecodeTableRow]:
+        """
+        Look up the bytes of a bytecode at the `length` consecutive indexes
+        from `index_start`, e.g. the bytes read by a copy event.
+        """
+        field_tag = FQ(BytecodeFieldTag.Byte)
+        rows = []
+        for i in range(length):
+            index = index_start.expr() + i
+            query: Mapping[str, Union[FQ, Expression, Word, None]] = {
+                "bytecode_hash": bytecode_hash,
+                "field_tag": field_tag,
+                "index": index,
+            }
+            candidates = self.bytecode_index.get(
+                self._bytecode_key(bytecode_hash, field_tag, index), []
+            )
+            rows.append(lookup(BytecodeTableRow, candidates, query))
+        return rows
+
+    @staticmethod
+    def _bytecode_key(
+        bytecode_hash: Word, field_tag: Expression, index: Expression
+    ) -> Tuple[int, int, int, int]:
+        return (
+            bytecode_hash.lo.expr().n,
+            bytecode_hash.hi.expr().n,
+            field_tag.expr().n,
+            index.expr().n,
+        )
 
     def rw_lookup(
         self,
@@ -755,7 +854,38 @@ class Tables:
             "value_prev": value_prev,
             "aux0": aux0,
         }
-        return lookup(RWTableRow, self.rw_table, query)
+        # Only the rows with the same rw_counter can match
+        candidates = self.rw_index.get(rw_counter.expr().n, [])
+        return lookup(RWTableRow, candidates, query)
+
+    def rw_range_lookup(
+        self,
+        rw_counter_start: Expression,
+        rw: Expression,
+        tag: Expression,
+        id: Expression,
+        address_start: Expression,
+        length: int,
+        rw_counter_step: int = 1,
+    ) -> List[RWTableRow]:
+        """
+        Look up the rw operations of a memory or tx log at the `length`
+        consecutive addresses from `address_start`, done every
+        `rw_counter_step` rw_counters from `rw_counter_start`, e.g. the reads
+        or writes of a copy event.
+        """
+        rows = []
+        for i in range(length):
+            rw_counter = rw_counter_start.expr() + i * rw_counter_step
+            query = {
+                "rw_counter": rw_counter,
+                "rw": rw,
+                "key0": tag,
+                "id": id,
+                "address": address_start.expr() + i,
+            }
+            rows.append(lookup(RWTableRow, self.rw_index.get(rw_counter.n, []), query))
+        return rows
 
     def copy_lookup(
         self,
@@ -863,7 +993,7 @@ T = TypeVar("T", bound=TableRow)
 
 def lookup(
     table_cls: Type[T],
-    table: Set[T],
+    table: Iterable[T],
     query: Mapping[str, Optional[Union[FQ, Expression, Word]]],
 ) -> T:
     table_name = table_cls.__name__
@@ -882,3 +1012,87 @@ def lookup(
         raise LookupAmbiguousFailure(table_name, query, matched_rows)
 
     return matched_rows[0]
+
+
+class MPTTableIndex:
+    """
+    MPT table indexed by (address, proof_type, storage_key), so that a lookup
+    only has to match the few rows that share its key instead of scanning the
+    whole table.
+    """
+
+    rows: Set[MPTTableRow]
+    index: Dict[Tuple[int, int, int, int], List[MPTTableRow]]
+
+    def __init__(self, rows: Set[MPTTableRow]) -> None:
+        self.rows = rows
+        self.index = {}
+        for row in rows:
+            self.index.setdefault(
+                self._key(row.address, row.proof_type, row.storage_key), []
+            ).append(row)
+
+    @staticmethod
+    def _key(
+        address: Expression, proof_type: Expression, storage_key: Word
+    ) -> Tuple[int, int, int, int]:
+        return (
+            address.expr().n,
+            proof_type.expr().n,
+            storage_key.lo.expr().n,
+            storage_key.hi.expr().n,
+        )
+
+    def lookup(self, query: Mapping[str, Union[Expression, Word]]) -> MPTTableRow:
+        address, proof_type, storage_key = (
+            query["address"],
+            query["proof_type"],
+            query["storage_key"],
+        )
+        assert isinstance(address, Expression) and isinstance(proof_type, Expression)
+        assert isinstance(storage_key, Word)
+        # Only the rows with the same key can match
+        candidates = self.index.get(self._key(address, proof_type, storage_key), [])
+        return lookup(MPTTableRow, candidates, query)
+
+    def verify_root_chain(self) -> Tuple[Word, Word]:
+        """
+        Check that the updates of the table form a single root_prev -> root
+        chain, where updates that don't change the root are attached to a
+        root of the chain, and return its first and last roots.
+
+        This is a helper to check the MPT tables built for tests and witness
+        generation: it isn't a constraint of the state or withdrawal circuits,
+        which only look up the updates they need.
+        """
+        # root_prev -> update, for the updates that change the root
+        updates: Dict[int, MPTTableRow] = {}
+        for row in self.rows:
+            root_prev = row.root_prev.int_value()
+            if row.root.int_value() != root_prev:
+                assert root_prev not in updates, f"MPT root {row.root_prev} is updated twice"
+                updates[root_prev] = row
+
+        if len(updates) == 0:
+            roots = set(row.root.int_value() for row in self.rows)
+            assert len(roots) <= 1, "MPT updates don't form a single chain"
+            root = Word(roots.pop() if len(roots) > 0 else 0)
+            return root, root
+
+        roots_next = set(row.root.int_value() for row in updates.values())
+        first_roots = [root for root in updates if root not in roots_next]
+        assert len(first_roots) == 1, "MPT updates don't form a single chain"
+
+        # Walk the chain from its first root
+        first_root = root = first_roots[0]
+        roots = {root}
+        while root in updates:
+            root = updates[root].root.int_value()
+            assert root not in roots, "MPT updates don't form a single chain"
+            roots.add(root)
+        assert len(roots) == len(updates) + 1, "MPT updates don't form a single chain"
+
+        for row in self.rows:
+            assert row.root.int_value() in roots, f"MPT root {row.root} is not in the chain"
+
+        return Word(first_root), Word(root)
@@ -1,8 +1,8 @@
 from __future__ import annotations
-import dataclasses
 from typing import (
     cast,
     Dict,
+    Iterable,
     Iterator,
     List,
     MutableSequence,
@@ -14,8 +14,9 @@ from typing import (
     Mapping,
     Tuple,
 )
-from functools import reduce
-from itertools import chain
+from collections import OrderedDict
+from functools import lru_cache, reduce
+from itertools import chain, repeat
 
 from ..util import (
     U64,
@@ -34,6 +35,7 @@ from ..util import (
     GAS_COST_TX_CALL_DATA_PER_NON_ZERO_BYTE,
     GAS_COST_TX_CALL_DATA_PER_ZERO_BYTE,
     EMPTY_CODE_HASH,
+    KeccakTable,
 )
 from .table import (
     RW,
@@ -315,13 +317,112 @@ class Withdrawal:
 
 
 def init_is_code(code: bytearray) -> MutableSequence[bool]:
-    is_codes = []
-    push_data_left = 0
-    for idx in range(0, len(code)):
-        is_code = push_data_left == 0
-        push_data_left = get_push_size(code[idx]) if is_code else push_data_left - 1
-        is_codes.append(is_code)
-    return is_codes
+    return list(BYTECODE_STORE.analyze(code).is_code)
+
+
+class BytecodeAnalysis:
+    """
+    Everything about a bytecode that only depends on its content: the is_code
+    bitmap, the push data layout and the unrolled bytecode table rows.
+    is_code has one entry per byte, while the push data columns have one
+    entry per table row, so their first entry is for the header row.  The
+    code hash and the table rows are computed on first use, as most users
+    only need the is_code bitmap.
+    """
+
+    code: bytes
+    is_code: Tuple[bool, ...]
+    push_data_left: Tuple[int, ...]
+    push_data_size: Tuple[int, ...]
+    _code_hash: Optional[U256]
+    # Shared by every user of the analysis, so it's immutable
+    _rows: Optional[Tuple[BytecodeTableRow, ...]]
+    # randomness -> value_rlc column
+    value_rlcs: Dict[FQ, Tuple[FQ, ...]]
+
+    def __init__(self, code: bytes) -> None:
+        self.code = code
+        is_codes = []
+        push_data_left = [0]
+        push_data_size = [0]
+        next_push_data_left = 0
+        for byte in code:
+            is_code = next_push_data_left == 0
+            push_data_left.append(next_push_data_left)
+            push_data_size.append(get_push_size(byte))
+            next_push_data_left = push_data_size[-1] if is_code else next_push_data_left - 1
+            is_codes.append(is_code)
+        self.is_code = tuple(is_codes)
+        self.push_data_left = tuple(push_data_left)
+        self.push_data_size = tuple(push_data_size)
+        self._code_hash = None
+        self._rows = None
+        self.value_rlcs = {}
+
+    @property
+    def code_hash(self) -> U256:
+        if self._code_hash is None:
+            self._code_hash = U256(int.from_bytes(keccak256(self.code), "big"))
+        return self._code_hash
+
+    @property
+    def rows(self) -> Tuple[BytecodeTableRow, ...]:
+        if self._rows is None:
+            hash_word = Word(self.code_hash)
+            header = BytecodeTableRow(
+                hash_word, FQ(BytecodeFieldTag.Header), FQ(0), FQ(0), FQ(len(self.code))
+            )
+            self._rows = (
+                header,
+                *(
+                    BytecodeTableRow(
+                        hash_word, FQ(BytecodeFieldTag.Byte), FQ(idx), FQ(is_code), FQ(byte)
+                    )
+                    for idx, (byte, is_code) in enumerate(zip(self.code, self.is_code))
+                ),
+            )
+        return self._rows
+
+    def value_rlc(self, randomness: FQ) -> Tuple[FQ, ...]:
+        value_rlc = self.value_rlcs.get(randomness)
+        if value_rlc is None:
+            acc = 0
+            column = [0]
+            for byte in self.code:
+                acc = (acc * randomness.n + byte) % FQ.field_modulus
+                column.append(acc)
+            value_rlc = self.value_rlcs[randomness] = tuple(FQ(acc) for acc in column)
+        return value_rlc
+
+
+class BytecodeStore:
+    """
+    Analyses of the distinct bytecodes keyed by their content, so that a
+    contract that is used many times is only analyzed (and hashed) once.  The
+    least recently used analyses are dropped beyond max_size.
+    """
+
+    max_size: int
+    analyses: OrderedDict[bytes, BytecodeAnalysis]
+
+    def __init__(self, max_size: int = 2**10) -> None:
+        self.max_size = max_size
+        self.analyses = OrderedDict()
+
+    def analyze(self, code: Union[bytes, bytearray]) -> BytecodeAnalysis:
+        code = bytes(code)
+        analysis = self.analyses.get(code)
+        if analysis is None:
+            analysis = BytecodeAnalysis(code)
+            self.analyses[code] = analysis
+            if len(self.analyses) > self.max_size:
+                self.analyses.popitem(last=False)
+        else:
+            self.analyses.move_to_end(code)
+        return analysis
+
+
+BYTECODE_STORE = BytecodeStore()
 
 
 class Bytecode:
@@ -387,7 +488,19 @@ class Bytecode:
     def hash(self) -> U256:
         return U256(int.from_bytes(keccak256(self.code), "big"))
 
-    def table_assignments(self) -> Iterator[BytecodeTableRow]:
+    def table_assignments(
+        self, analysis: Optional[BytecodeAnalysis] = None
+    ) -> Iterator[BytecodeTableRow]:
+        """
+        Return the bytecode table rows.  The rows of the analysis of the code
+        (looked up in BYTECODE_STORE when it's not given) are reused, unless
+        is_code was assigned by hand.
+        """
+        if analysis is None or analysis.code != self.code:
+            analysis = BYTECODE_STORE.analyze(self.code)
+        if tuple(self.is_code) == analysis.is_code:
+            return iter(analysis.rows)
+
         class BytecodeIterator:
             idx: int
             hash: Word
@@ -847,24 +960,76 @@ class RWDictionary:
 
 class KeccakCircuit:
     rows: List[KeccakTableRow]
+    # Keccak oracle shared with the other circuits of the block
+    keccak_table: KeccakTable
 
-    def __init__(self) -> None:
+    def __init__(self, keccak_table: Optional[KeccakTable] = None) -> None:
         self.rows = []
+        self.keccak_table = KeccakTable() if keccak_table is None else keccak_table
 
     def add(self, data: bytes, r: FQ) -> KeccakCircuit:
+        # The RLC of the preimage is shared with the oracle, but the output of
+        # this table is the big-endian digest
+        _, input_rlc, input_len, _ = self.keccak_table.add(data, r)
         output = Word(int.from_bytes(keccak256(data), "big"))
-        acc_input = RLC(bytes(reversed(data)), r, n_bytes=len(data))
         self.rows.append(
             KeccakTableRow(
                 state_tag=FQ(2),  # Finalize
-                input_rlc=acc_input.expr(),
-                input_len=FQ(len(data)),
+                input_rlc=input_rlc,
+                input_len=input_len,
                 output=output,
             )
         )
         return self
 
 
+# Maximum number of (base, exponent) pairs kept by the exp_steps cache
+EXP_STEPS_CACHE_SIZE = 2**10
+
+# The columns of an exp step: (base, exponent, exponentiation, a, b, quotient, parity)
+ExpStep = Tuple[Word, Word, Word, Word, Word, Word, FQ]
+
+
+@lru_cache(maxsize=EXP_STEPS_CACHE_SIZE)
+def exp_steps(base: int, exponent: int) -> Tuple[ExpStep, ...]:
+    """
+    Return the square-and-multiply steps of base**exponent mod 2**256, from
+    the step of the full exponent down to the step of exponent 2.  An odd
+    exponent is decremented and an even one is halved at each step, and the
+    multiplication of each step takes the result of the next one as a.
+
+    >>> [step[1].int_value() for step in exp_steps(3, 5)]
+    [5, 4, 2]
+    >>> assert exp_steps(3, 5)[0][2] == Word(3**5)
+    """
+    # we assume that base and exponent are both < 2**256
+    exponents: List[int] = []
+    while exponent > 1:
+        exponents.append(exponent)
+        exponent = exponent - 1 if exponent % 2 == 1 else exponent // 2
+
+    base_word = Word(base)
+    steps: List[ExpStep] = []
+    a, exponentiation = base_word, base
+    exponent_word = Word(1)
+    for exponent in reversed(exponents):
+        quotient, is_odd = divmod(exponent, 2)
+        if is_odd == 1:
+            # exponent is odd: a * base, and the quotient isn't the next exponent
+            b, quotient_word = base_word, Word(quotient)
+            exponentiation = (exponentiation * base) % POW2
+        else:
+            # exponent is even: a * a, and the quotient is the next exponent
+            b, quotient_word = a, exponent_word
+            exponentiation = (exponentiation * exponentiation) % POW2
+        exponent_word = Word(exponent)
+        d = Word(exponentiation)
+        steps.append((base_word, exponent_word, d, a, b, quotient_word, FQ(is_odd)))
+        a = d
+    steps.reverse()
+    return tuple(steps)
+
+
 class ExpCircuit:
     rows: List[ExpCircuitRow]
     max_exp_steps: int
@@ -878,87 +1043,49 @@ class ExpCircuit:
         return self.rows
 
     def add_event(self, base: int, exponent: int, identifier: IntOrFQ):
-        steps: List[Tuple[int, int, int]] = []
-        exponentiation = self._exp_by_squaring(base, exponent, steps)
-        steps.reverse()
-        self._append_steps(base, exponent, exponentiation, steps, identifier)
-        return self
-
-    def _exp_by_squaring(self, base: int, exponent: int, steps: List[Tuple[int, int, int]]):
-        # we assume that base and exponent are both < 2**256
-        if exponent == 0:
-            return 1
-        if exponent == 1:
-            return base
-
-        exp1 = self._exp_by_squaring(base, exponent // 2, steps)
-        exp2 = (exp1 * exp1) % POW2
-        steps.append((exp1, exp1, exp2))
-        if exponent % 2 == 0:
-            # exponent is even
-            return exp2
-        else:
-            # exponent is odd
-            exp = (base * exp2) % POW2
-            steps.append((exp2, base, exp))
-            return exp
-
-    def _append_steps(
-        self,
-        base: int,
-        exponent: int,
-        exponentiation: int,
-        steps: List[Tuple[int, int, int]],
-        identifier: IntOrFQ,
-    ):
-        base_word = Word(base)
-        for i, step in enumerate(steps):
-            # multiplication gadget
-            a, b, d = step[0], step[1], step[2]
-            # exp table
-            quotient, is_odd = divmod(exponent, 2)
-            exponent_word = Word(exponent)
+        # The steps of a (base, exponent) pair are shared by all its events,
+        # only the identifier (and so the rows) is specific to each event
+        steps = exp_steps(base, exponent)
+        identifier = FQ(identifier)
+        zero = Word(0)
+        for i, (base_word, exponent_word, exponentiation, a, b, quotient, parity) in enumerate(
+            steps
+        ):
             self._append_step(
                 identifier,
                 FQ(1 if i == len(steps) - 1 else 0),
                 base_word,
                 exponent_word,
-                Word(d),
-                Word(a),
-                Word(b),
-                Word(0),
-                Word(d),
-                Word(quotient),
-                FQ(is_odd),
+                exponentiation,
+                a,
+                b,
+                zero,
+                exponentiation,
+                quotient,
+                parity,
             )
-            if is_odd == 0:
-                # exponent is even
-                exponent = exponent // 2
-            else:
-                # exponent is odd
-                exponent = exponent - 1
+        return self
 
     def fill_dummy_events(self):
+        # The dummy rows are all the same row, so that they are verified once
         max_exp_rows = self.max_exp_steps * self.OFFSET_INCREMENT
         rows_left = max_exp_rows - len(self.rows)
-        for i in range(rows_left):
-            self.rows.append(
-                ExpCircuitRow(
-                    q_usable=FQ.one(),
-                    is_step=FQ.zero(),
-                    identifier=FQ.zero(),
-                    is_last=FQ.zero(),
-                    base=Word(1),
-                    exponent=Word(1),
-                    exponentiation=Word(1),
-                    a=Word(1),
-                    b=Word(1),
-                    c=Word(0),
-                    d=Word(1),
-                    q=Word(0),
-                    r=FQ(1),
-                )
-            )
+        dummy_row = ExpCircuitRow(
+            q_usable=FQ.one(),
+            is_step=FQ.zero(),
+            identifier=FQ.zero(),
+            is_last=FQ.zero(),
+            base=Word(1),
+            exponent=Word(1),
+            exponentiation=Word(1),
+            a=Word(1),
+            b=Word(1),
+            c=Word(0),
+            d=Word(1),
+            q=Word(0),
+            r=FQ(1),
+        )
+        self.rows.extend([dummy_row] * rows_left)
         return self
 
     def _append_step(
@@ -1019,32 +1146,64 @@ class CopyCircuit:
         src_addr_end: IntOrFQ,
         dst_addr: IntOrFQ,
         copy_length: IntOrFQ,
-        src_data: Mapping[IntOrFQ, Union[IntOrFQ, Tuple[IntOrFQ, IntOrFQ]]],
+        src_data: Union[
+            Mapping[IntOrFQ, Union[IntOrFQ, Tuple[IntOrFQ, IntOrFQ]]], bytes, bytearray, memoryview
+        ],
         log_id: int = 0,
+        src_is_code: Optional[Sequence[IntOrFQ]] = None,
     ):
-        new_rows: List[CopyCircuitRow] = []
-        rlc_acc = FQ.zero()
-        for i in range(int(copy_length)):
-            if int(src_addr + i) < int(src_addr_end):
-                is_pad = False
-                assert src_addr + i in src_data, f"Cannot find data at the offset {src_addr+i}"
-                value = src_data[src_addr + i]
-                if src_tag == CopyDataTypeTag.Bytecode or dst_tag == CopyDataTypeTag.Bytecode:
-                    value = cast(Tuple[IntOrFQ, IntOrFQ], value)
-                    value, is_code = value
-                else:
-                    value = cast(IntOrFQ, value)
-                    is_code = FQ(0)
-                value = FQ(value)
-                is_code = FQ(is_code)
+        """
+        Copy copy_length bytes from src_addr to dst_addr, padding with 0s from
+        src_addr_end.  src_data maps each source address to its value, or to
+        (value, is_code) when copying from or to a bytecode.  It can also be
+        the source bytes from address 0, in which case only the copied range
+        is sliced and the is_code flags of a bytecode are given in src_is_code.
+        """
+        is_bytecode = src_tag == CopyDataTypeTag.Bytecode or dst_tag == CopyDataTypeTag.Bytecode
+        copy_length = int(copy_length)
+        data_length = max(0, min(copy_length, int(src_addr_end) - int(src_addr)))
+        src_items: Iterable[Tuple[IntOrFQ, IntOrFQ]]
+        if isinstance(src_data, (bytes, bytearray, memoryview)):
+            start, end = int(src_addr), int(src_addr) + data_length
+            data = memoryview(src_data)[start:end]
+            assert len(data) == data_length, f"Cannot find data at the offset {start + len(data)}"
+            if is_bytecode:
+                assert src_is_code is not None, "Copying a bytecode requires its is_code flags"
+                src_items = zip(data, src_is_code[start:end])
             else:
-                is_pad = True
-                value = FQ(0)
-                is_code = FQ(0)
+                src_items = zip(data, repeat(0))
+        else:
+            src_items = (
+                self._read_src_data(src_data, src_addr + i, is_bytecode) for i in range(data_length)
+            )
+
+        # Read the source data first, so that the final rlc_acc and the number of
+        # rw operations are known before the rows are assigned in a single pass
+        values: List[Tuple[FQ, FQ, bool]] = []
+        rlc_acc = FQ.zero()
+        for value, is_code in src_items:
+            value = FQ(value)
+            if dst_tag == CopyDataTypeTag.RlcAcc:
+                rlc_acc = rlc_acc * r + value
+            values.append((value, FQ(is_code), False))
+        for _ in range(copy_length - data_length):
+            if dst_tag == CopyDataTypeTag.RlcAcc:
+                rlc_acc = rlc_acc * r
+            values.append((FQ(0), FQ(0), True))
 
+        # Memory reads of the non padding bytes and memory or log writes of all bytes
+        rw_counter_end = rw_dict.rw_counter
+        if src_tag == CopyDataTypeTag.Memory:
+            rw_counter_end += sum(not is_pad for _, _, is_pad in values)
+        if dst_tag in (CopyDataTypeTag.Memory, CopyDataTypeTag.TxLog):
+            rw_counter_end += len(values)
+
+        rlc_acc_final = rlc_acc if dst_tag == CopyDataTypeTag.RlcAcc else FQ.zero()
+        rlc_acc = FQ.zero()
+        for i, (value, is_code, is_pad) in enumerate(values):
             # read row, because TxLog is write-only, no need to feed log_id in the read row
             self._append_row(
-                new_rows,
+                self.rows,
                 rw_dict,
                 False,
                 i == 0,
@@ -1053,9 +1212,10 @@ class CopyCircuit:
                 src_tag,
                 src_addr + i,
                 value,
-                FQ.zero(),  # rlc_acc will be updated later
+                rlc_acc_final,
                 is_code,
                 is_pad,
+                rw_counter_end,
                 src_addr_end=src_addr_end,
                 bytes_left=copy_length - i,
             )
@@ -1064,7 +1224,7 @@ class CopyCircuit:
             if dst_tag == CopyDataTypeTag.RlcAcc:
                 rlc_acc = rlc_acc * r + value
             self._append_row(
-                new_rows,
+                self.rows,
                 rw_dict,
                 True,
                 False,
@@ -1073,23 +1233,28 @@ class CopyCircuit:
                 dst_tag,
                 dst_addr + i,
                 rlc_acc if dst_tag == CopyDataTypeTag.RlcAcc else value,
-                FQ.zero(),
+                rlc_acc_final,
                 is_code,
                 False,
+                rw_counter_end,
                 log_id=log_id,
             )
 
-        # update the rwc_inc_left column
-        rw_counter = rw_dict.rw_counter
-        new_rows = [
-            dataclasses.replace(row, rwc_inc_left=rw_counter - row.rw_counter, rlc_acc=rlc_acc)
-            if dst_tag == CopyDataTypeTag.RlcAcc
-            else dataclasses.replace(row, rwc_inc_left=rw_counter - row.rw_counter)
-            for row in new_rows
-        ]
-        self.rows.extend(new_rows)
+        assert rw_dict.rw_counter == rw_counter_end
         return self
 
+    @staticmethod
+    def _read_src_data(
+        src_data: Mapping[IntOrFQ, Union[IntOrFQ, Tuple[IntOrFQ, IntOrFQ]]],
+        addr: IntOrFQ,
+        is_bytecode: bool,
+    ) -> Tuple[IntOrFQ, IntOrFQ]:
+        assert addr in src_data, f"Cannot find data at the offset {addr}"
+        value = src_data[addr]
+        if is_bytecode:
+            return cast(Tuple[IntOrFQ, IntOrFQ], value)
+        return cast(IntOrFQ, value), 0
+
     def _append_row(
         self,
         rows: MutableSequence[CopyCircuitRow],
@@ -1104,6 +1269,7 @@ class CopyCircuit:
         rlc_acc: IntOrFQ,
         is_code: IntOrFQ,
         is_pad: bool,
+        rw_counter_end: int,
         src_addr_end: IntOrFQ = FQ(0),
         bytes_left: IntOrFQ = FQ(0),
         log_id: int = 0,
@@ -1141,7 +1307,7 @@ class CopyCircuit:
                 is_code=FQ(is_code),
                 is_pad=FQ(is_pad),
                 rw_counter=FQ(rw_counter),
-                rwc_inc_left=FQ(0),  # placeholder for now
+                rwc_inc_left=FQ(rw_counter_end - rw_counter),
                 is_memory=FQ(is_memory),
                 is_bytecode=FQ(is_bytecode),
                 is_tx_calldata=FQ(is_tx_calldata),
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Sequence, Tuple
 from .evm_circuit import (
     ExpCircuit,
     ExpCircuitRow,
@@ -7,9 +7,13 @@ from .util import (
     ConstraintSystem,
     FQ,
     Word,
+    distinct_row_pairs,
     mul_add_words,
 )
 
+MASK64 = 2**64 - 1
+MASK128 = 2**128 - 1
+
 
 def verify_step(cs: ConstraintSystem, rows: List[ExpCircuitRow]):
     # for every step except the last
@@ -85,13 +89,106 @@ def verify_step(cs: ConstraintSystem, rows: List[ExpCircuitRow]):
         cs.constrain_equal_word(rows[0].base, rows[0].b)
 
 
+def _word_ints(word: Word) -> Tuple[int, int]:
+    return word.lo.expr().n, word.hi.expr().n
+
+
+def _mul_add_carries_ok(a: int, b: int, c: Tuple[int, int], d: Tuple[int, int]) -> bool:
+    """
+    Integer version of the mul_add_words constraints: both carries must be
+    exact multiples of 2**128 that fit in 9 bytes.  a and b are 256-bit.
+    """
+    a0, a1, a2, a3 = a & MASK64, (a >> 64) & MASK64, (a >> 128) & MASK64, a >> 192
+    b0, b1, b2, b3 = b & MASK64, (b >> 64) & MASK64, (b >> 128) & MASK64, b >> 192
+    t0 = a0 * b0
+    t1 = a0 * b1 + a1 * b0
+    t2 = a0 * b2 + a1 * b1 + a2 * b0
+    t3 = a0 * b3 + a1 * b2 + a2 * b1 + a3 * b0
+    carry_lo = t0 + (t1 << 64) + c[0] - d[0]
+    if carry_lo < 0 or carry_lo & MASK128 != 0 or carry_lo >> 128 >= 2**72:
+        return False
+    carry_hi = t2 + (t3 << 64) + c[1] + (carry_lo >> 128) - d[1]
+    return carry_hi >= 0 and carry_hi & MASK128 == 0 and carry_hi >> 128 < 2**72
+
+
+def verify_exp_table(rows: Sequence[ExpCircuitRow]) -> bool:
+    """
+    Check the constraints of verify_step on all the rows at once, with the
+    columns read as integers instead of evaluating each constraint in FQ.
+    Return False when a row doesn't satisfy them, or has a non boolean
+    selector or a word limb out of range, in which case the rows should be
+    verified one by one to find the failing constraint.
+    """
+    # Repeated (row, next row) pairs, such as the dummy rows, are checked once
+    pairs = list(distinct_row_pairs(rows, wrap=True))
+    cur = [row for row, _ in pairs]
+    nxt = [next_row for _, next_row in pairs]
+
+    # Read the columns as integers
+    is_step = [row.is_step.expr().n for row in cur]
+    is_last = [row.is_last.expr().n for row in cur]
+    parity = [row.r.expr().n for row in cur]
+    words = {
+        name: [_word_ints(getattr(row, name)) for row in cur]
+        for name in ("base", "exponent", "exponentiation", "a", "b", "c", "d", "q")
+    }
+    next_base = [_word_ints(row.base) for row in nxt]
+    next_d = [_word_ints(row.d) for row in nxt]
+    next_exponent = [_word_ints(row.exponent) for row in nxt]
+    if any(value not in (0, 1) for column in (is_step, is_last, parity) for value in column):
+        return False
+    if any(
+        lo > MASK128 or hi > MASK128
+        for column in (*words.values(), next_base, next_d, next_exponent)
+        for lo, hi in column
+    ):
+        return False
+
+    # Multiplication and parity check of every row, as the range checks of
+    # the carries are not conditioned on is_step
+    a, b, c, d = words["a"], words["b"], words["c"], words["d"]
+    exponent, q = words["exponent"], words["q"]
+    for i in range(len(cur)):
+        if not _mul_add_carries_ok(
+            a[i][0] + (a[i][1] << 128), b[i][0] + (b[i][1] << 128), c[i], d[i]
+        ):
+            return False
+        if not _mul_add_carries_ok(2, q[i][0] + (q[i][1] << 128), (parity[i], 0), exponent[i]):
+            return False
+
+    base, exponentiation = words["base"], words["exponentiation"]
+    for i in range(len(cur)):
+        if is_step[i] == 1:
+            if exponentiation[i] != d[i] or c[i] != (0, 0):
+                return False
+            if is_last[i] == 0:
+                if (
+                    base[i] != next_base[i]
+                    or a[i] != next_d[i]
+                    or cur[i].identifier.expr() != nxt[i].identifier.expr()
+                ):
+                    return False
+                if parity[i] == 1:
+                    expected_exponent = (exponent[i][0] - 1, exponent[i][1])
+                    if next_exponent[i] != expected_exponent or b[i] != base[i]:
+                        return False
+                elif next_exponent[i] != q[i] or a[i] != b[i]:
+                    return False
+        if is_last[i] == 1 and (exponent[i] != (2, 0) or a[i] != base[i] or b[i] != base[i]):
+            return False
+    return True
+
+
 def verify_exp_circuit(exp_circuit: ExpCircuit):
-    cs = ConstraintSystem()
+    """
+    Verify the whole table at once, and when that fails each row against the
+    next one (the last row wraps to the first), so that the error points to
+    the failing constraint.  A pair of rows is only checked once when it
+    repeats, so the shared dummy rows cost a single check.
+    """
     exp_table = exp_circuit.table()
-    n = len(exp_table)
-    for i, row in enumerate(exp_table):
-        rows = [
-            row,
-            exp_table[(i + 1) % n],
-        ]
-        verify_step(cs, rows)
+    if verify_exp_table(exp_table):
+        return
+    cs = ConstraintSystem()
+    for row, next_row in distinct_row_pairs(exp_table, wrap=True):
+        verify_step(cs, [row, next_row])
@@ -1,17 +1,17 @@
 from dataclasses import dataclass
-from typing import List, Set, Tuple, Union
-
-from eth_utils import keccak
+from itertools import islice
+from typing import List, Mapping, Optional, Sequence, Set, Tuple, Union
 
 from zkevm_specs.util.arithmetic import bytes_to_fq
 from zkevm_specs.util.param import N_BYTES_WORD
 
-from .evm_circuit.table import TableRow, lookup
+from .evm_circuit.table import LookupUnsatFailure, TableRow, lookup
 from .tx_circuit import Tag as TxTag
 from .util import FQ, GAS_COST_TX_CALL_DATA_PER_NON_ZERO_BYTE, GAS_COST_TX_CALL_DATA_PER_ZERO_BYTE
 from .util import PUBLIC_INPUTS_BLOCK_LEN as BLOCK_LEN
 from .util import PUBLIC_INPUTS_TX_LEN as TX_LEN
-from .util import RLC, U8, U64, U160, U256, Expression, Word, WordOrValue, is_circuit_code
+from .util import U8, U64, U160, U256, Expression, KeccakTable, Word, WordOrValue
+from .util import batch_inv, is_circuit_code, keccak256
 
 
 @dataclass
@@ -75,30 +75,31 @@ class FixedU16Row(TableRow):
     value: FQ
 
 
-class KeccakTable:
-    # The columns are: (is_enabled, input_rlc, input_len, output)
-    table: Set[Tuple[FQ, FQ, FQ, Word]]
+class FixedU16Table:
+    """
+    Fixed table with the values in [0, 2**16).  Lookups are answered with a
+    range check instead of a scan, and the column is only materialized when
+    it's exported with `rows`.
+    """
 
-    def __init__(self):
-        self.table = set()
-        self.table.add((FQ.zero(), FQ.zero(), FQ.zero(), Word(0)))  # Add all 0s row
-
-    def add(self, input: bytes, keccak_randomness: FQ):
-        output = keccak(input)
-        self.table.add(
-            (
-                FQ.one(),
-                RLC(bytes(reversed(input)), keccak_randomness, n_bytes=len(input)).expr(),
-                FQ(len(input)),
-                Word(output),
-            )
-        )
+    _rows: Optional[Set[FixedU16Row]] = None
+
+    def lookup(self, query: Mapping[str, Expression]) -> FixedU16Row:
+        table_name = FixedU16Row.__name__
+        FixedU16Row.validate_query(table_name, query)
+        value = query["value"].expr()
+        if value.n >= 1 << 16:
+            raise LookupUnsatFailure(table_name, query)
+        return FixedU16Row(value)
+
+    def rows(self) -> Set[FixedU16Row]:
+        if self._rows is None:
+            self._rows = set([FixedU16Row(FQ(i)) for i in range(1 << 16)])
+        return self._rows
 
-    def lookup(self, is_enabled: FQ, input_rlc: FQ, input_len: FQ, output: Word, assert_msg: str):
-        assert (is_enabled, input_rlc, input_len, output) in self.table, (
-            f"{assert_msg}: {(is_enabled, input_rlc, input_len, output)} "
-            + "not found in the lookup table"
-        )
+
+# The fixed table is the same for every verification
+FIXED_U16_TABLE = FixedU16Table()
 
 
 @dataclass
@@ -151,7 +152,7 @@ def check_row(
     row: Row,
     row_next: Row,
     calldata_gas_cost_table: Set[TxCallDataGasCostAccRow],
-    fixed_u16_table: Set[FixedU16Row],
+    fixed_u16_table: FixedU16Table,
     keccak_table: KeccakTable,
     circuit_len: FQ,
 ):
@@ -251,7 +252,7 @@ def check_row(
         tx_id_diff_minus_one_query = {
             "value": tx_id_not_equal_to_next * is_tx_id_next_nonzero * tx_id_diff_minus_one
         }
-        lookup(FixedU16Row, fixed_u16_table, tx_id_diff_minus_one_query)
+        fixed_u16_table.lookup(tx_id_diff_minus_one_query)
 
         idx_of_same_tx_constraint = tx_id_equal_to_next * (
             row_next.tx_table.index - row.tx_table.index - one
@@ -321,6 +322,53 @@ def check_row(
         assert row.withdrawal_table.amount != zero
 
 
+class CopyConstraintCursor:
+    """
+    Reads the copy constraints of the public inputs in one linear pass.  The
+    values are laid out in sections (block, tx, calldata, withdrawal...), and a
+    failed check reports the section and the offset of the value in it.
+    """
+
+    values: Sequence[bytes]
+    # offset of the next value
+    offset: int
+    section: str
+    # offset of the first value of the current section
+    section_start: int
+
+    def __init__(self, values: Sequence[bytes]):
+        self.values = values
+        self.offset = 0
+        self.section = ""
+        self.section_start = 0
+
+    def checkpoint(self, section: str):
+        """Start a new section of values"""
+        self.section = section
+        self.section_start = self.offset
+
+    def next_le(self) -> bytes:
+        """Return the next value in little-endian order"""
+        assert self.offset < len(self.values), f"Missing copy constraint in {self.section} section"
+        value = self.values[self.offset]
+        self.offset += 1
+        return value[::-1]
+
+    def finish(self):
+        """Check that all the values were read"""
+        assert self.offset == len(self.values), (
+            f"{len(self.values) - self.offset} copy constraints left "
+            + f"after the {self.section} section"
+        )
+
+    def check(self, ok: bool):
+        """Check a copy constraint of the last value"""
+        assert ok, (
+            f"Copy constraint mismatch in {self.section} section "
+            + f"at offset {self.offset - 1 - self.section_start}"
+        )
+
+
 @dataclass
 class Witness:
     rows: List[Row]  # PublicInputs rows
@@ -352,9 +400,7 @@ def verify_circuit(
     block_table = witness.block_table
     tx_table = witness.tx_table
     withdrawal_table = witness.withdrawal_table
-    copy_constrains = witness.copy_constrains
-
-    fixed_u16_table = set([FixedU16Row(FQ(i)) for i in range(1 << 16)])
+    copy_constrains = CopyConstraintCursor(witness.copy_constrains)
 
     # copy constraint from public input to advice column
     # must copy constrain `hi` part to zero for non_word value, otherwise `hi` can be anything
@@ -363,86 +409,94 @@ def verify_circuit(
     assert rows[0].rpi_digest_word == public_inputs.pi_keccak
 
     # constrain block table word_or_value equals witness rpi bytes in vertical order
+    copy_constrains.checkpoint("block")
     for i in range(BLOCK_LEN // 2 + 1):
         block_row = block_table.table[i]
 
-        lo_le = copy_constrains.pop(0)[::-1]
+        lo_le = copy_constrains.next_le()
         if block_row.is_word:
-            hi_le = copy_constrains.pop(0)[::-1]
+            hi_le = copy_constrains.next_le()
         else:
             hi_le = bytes(0)[::-1]
         (lo_expr, hi_expr) = block_row.to_lo_hi()
-        assert lo_expr == bytes_to_fq(lo_le)
-        assert hi_expr == bytes_to_fq(hi_le)
+        copy_constrains.check(lo_expr == bytes_to_fq(lo_le))
+        copy_constrains.check(hi_expr == bytes_to_fq(hi_le))
 
     # constrain block_hash and state_root lo/hi.
     # TODO layout block_hash in proper table
-    lo_le = copy_constrains.pop(0)[::-1]
-    hi_le = copy_constrains.pop(0)[::-1]
-    assert public_inputs.block_hash.lo.expr() == bytes_to_fq(lo_le)
-    assert public_inputs.block_hash.hi.expr() == bytes_to_fq(hi_le)
+    copy_constrains.checkpoint("block_hash")
+    lo_le = copy_constrains.next_le()
+    hi_le = copy_constrains.next_le()
+    copy_constrains.check(public_inputs.block_hash.lo.expr() == bytes_to_fq(lo_le))
+    copy_constrains.check(public_inputs.block_hash.hi.expr() == bytes_to_fq(hi_le))
 
     # TODO layout state_root in proper table
-    lo_le = copy_constrains.pop(0)[::-1]
-    hi_le = copy_constrains.pop(0)[::-1]
-    assert public_inputs.state_root.lo.expr() == bytes_to_fq(lo_le)
-    assert public_inputs.state_root.hi.expr() == bytes_to_fq(hi_le)
+    copy_constrains.checkpoint("state_root")
+    lo_le = copy_constrains.next_le()
+    hi_le = copy_constrains.next_le()
+    copy_constrains.check(public_inputs.state_root.lo.expr() == bytes_to_fq(lo_le))
+    copy_constrains.check(public_inputs.state_root.hi.expr() == bytes_to_fq(hi_le))
 
     # TODO layout state_root_prev in proper table
-    lo_le = copy_constrains.pop(0)[::-1]
-    hi_le = copy_constrains.pop(0)[::-1]
-    assert public_inputs.state_root_prev.lo.expr() == bytes_to_fq(lo_le)
-    assert public_inputs.state_root_prev.hi.expr() == bytes_to_fq(hi_le)
+    copy_constrains.checkpoint("state_root_prev")
+    lo_le = copy_constrains.next_le()
+    hi_le = copy_constrains.next_le()
+    copy_constrains.check(public_inputs.state_root_prev.lo.expr() == bytes_to_fq(lo_le))
+    copy_constrains.check(public_inputs.state_root_prev.hi.expr() == bytes_to_fq(hi_le))
 
     # constrain tx table `id``, `index`, value lo/hi per row, and all rows equals witness rpi bytes in vertical order
+    copy_constrains.checkpoint("tx")
     tx_len = TX_LEN * MAX_TXS + 1
     for i in range(tx_len):
         tx_row: TxTableRow = tx_table.table[i]
         tx_id, index, value = tx_row.tx_id, tx_row.index, tx_row.value
-        lo_le = copy_constrains.pop(0)[::-1]
-        assert tx_id == bytes_to_fq(lo_le)
-        lo_le = copy_constrains.pop(0)[::-1]
-        assert index == bytes_to_fq(lo_le)
+        lo_le = copy_constrains.next_le()
+        copy_constrains.check(tx_id == bytes_to_fq(lo_le))
+        lo_le = copy_constrains.next_le()
+        copy_constrains.check(index == bytes_to_fq(lo_le))
 
-        lo_le = copy_constrains.pop(0)[::-1]
+        lo_le = copy_constrains.next_le()
         if value.is_word:
-            hi_le = copy_constrains.pop(0)[::-1]
+            hi_le = copy_constrains.next_le()
         else:
             hi_le = bytes(0)
-        assert value.lo.expr() == bytes_to_fq(lo_le)
-        assert value.hi.expr() == bytes_to_fq(hi_le)
+        copy_constrains.check(value.lo.expr() == bytes_to_fq(lo_le))
+        copy_constrains.check(value.hi.expr() == bytes_to_fq(hi_le))
 
     # constrain tx calldata value lo/hi to equal witness rpi bytes in vertical order
+    copy_constrains.checkpoint("calldata")
     calldata_len = MAX_CALLDATA_BYTES
     for i in range(calldata_len):
         value = tx_table.table[tx_len + i].value
 
-        lo_le = copy_constrains.pop(0)[::-1]
+        lo_le = copy_constrains.next_le()
         if value.is_word:
-            hi_le = copy_constrains.pop(0)[::-1]
+            hi_le = copy_constrains.next_le()
         else:
             hi_le = bytes(0)
-        assert value.lo.expr() == bytes_to_fq(lo_le)
-        assert value.hi.expr() == bytes_to_fq(hi_le)
+        copy_constrains.check(value.lo.expr() == bytes_to_fq(lo_le))
+        copy_constrains.check(value.hi.expr() == bytes_to_fq(hi_le))
 
     # constrain withdrawal table `id``, `validator_id`, `address` and `amount` per row, and all rows equals witness rpi bytes in vertical order
+    copy_constrains.checkpoint("withdrawal")
     withdrawal_len = MAX_WITHDRAWALS
     for i in range(withdrawal_len):
         wd_row: WithdrawalTableRow = withdrawal_table.table[i]
 
-        lo_le = copy_constrains.pop(0)[::-1]
-        assert wd_row.id == bytes_to_fq(lo_le)
+        lo_le = copy_constrains.next_le()
+        copy_constrains.check(wd_row.id == bytes_to_fq(lo_le))
 
-        lo_le = copy_constrains.pop(0)[::-1]
-        assert wd_row.validator_id == bytes_to_fq(lo_le)
+        lo_le = copy_constrains.next_le()
+        copy_constrains.check(wd_row.validator_id == bytes_to_fq(lo_le))
 
-        lo_le = copy_constrains.pop(0)[::-1]
-        hi_le = copy_constrains.pop(0)[::-1]
-        assert wd_row.address.lo.expr() == bytes_to_fq(lo_le)
-        assert wd_row.address.hi.expr() == bytes_to_fq(hi_le)
+        lo_le = copy_constrains.next_le()
+        hi_le = copy_constrains.next_le()
+        copy_constrains.check(wd_row.address.lo.expr() == bytes_to_fq(lo_le))
+        copy_constrains.check(wd_row.address.hi.expr() == bytes_to_fq(hi_le))
 
-        lo_le = copy_constrains.pop(0)[::-1]
-        assert wd_row.amount == bytes_to_fq(lo_le)
+        lo_le = copy_constrains.next_le()
+        copy_constrains.check(wd_row.amount == bytes_to_fq(lo_le))
+    copy_constrains.finish()
 
     # check gates constrains
     for i in range(len(rows)):
@@ -452,7 +506,7 @@ def verify_circuit(
             row,
             row_next,
             calldata_gas_cost_table,
-            fixed_u16_table,
+            FIXED_U16_TABLE,
             keccak_table,
             witness.circuit_len,
         )
@@ -841,6 +895,7 @@ def public_data2witness(
     MAX_TXS: int,
     MAX_CALLDATA_BYTES: int,
     MAX_WITHDRAWALS: int,
+    keccak_table: Optional[KeccakTable] = None,
 ) -> Witness:
     # Layout of raw_public_inputs:
     #   # Block Table. `value.hi` is optional depends on the original value bits size.
@@ -910,39 +965,47 @@ def public_data2witness(
     circuit_len += N_BYTES_WITHDRAWAL * MAX_WITHDRAWALS
     assert flatten_len(rpi_byte_values) == circuit_len
 
-    keccak_table = KeccakTable()
+    if keccak_table is None:
+        keccak_table = KeccakTable()
     block_table = BlockTable()
     tx_table = TxTable()
     withdrawal_table = WithdrawalTable()
 
     rows: List[Row] = []
+    # (tx_id, tx_value_lo, tx_id_diff) of each row, which are inverted in one
+    # batch once all the rows are built
+    values_to_invert: List[Tuple[FQ, FQ, FQ]] = []
     calldata_gas_cost_table = [TxCallDataGasCostAccRow(FQ.zero(), FQ.zero(), FQ.zero())]
     i = circuit_len - 1
-    rpi_bytes_keccakrlc = []
-    rpi_value_lc = []
+    # The rlc columns are accumulated as ints, and only the row cells are FQ
+    modulus = FQ.field_modulus
+    rpi_bytes_keccakrlc = 0
+    rpi_value_lc = 0
     rpi_bytes = []
+    # Cells shared by the rows, so they are not built again for each byte
+    zero, one, empty_word = FQ.zero(), FQ.one(), Word(0)
+    empty_tx_row = TxTableRow(zero, zero, zero, WordOrValue(zero))
+    empty_wd_row = WithdrawalTableRow(zero, zero, empty_word, zero)
 
     for value in reversed(rpi_byte_values):  # acc from big endian
         for byte_index, byte in enumerate(value):
             rpi_bytes.append(byte)
 
-            q_rpi_byte_enable = FQ.one()
-            q_bytes_last = FQ.one() if len(rpi_bytes) == 1 else FQ.zero()
-            q_rpi_keccak_lookup = (
-                FQ.one() if i == 0 else FQ.zero()
-            )  # keccak lookup happened in first row
-            q_rpi_value_start = FQ.zero()
+            q_rpi_byte_enable = one
+            q_bytes_last = one if len(rpi_bytes) == 1 else zero
+            q_rpi_keccak_lookup = one if i == 0 else zero  # keccak lookup happened in first row
+            q_rpi_value_start = zero
 
             if i == circuit_len - 1:
-                rpi_bytes_keccakrlc = [FQ(byte)]
+                rpi_bytes_keccakrlc = byte
             else:
-                rpi_bytes_keccakrlc.append(FQ(rpi_bytes_keccakrlc[-1] * keccak_rand + byte))
+                rpi_bytes_keccakrlc = (rpi_bytes_keccakrlc * keccak_rand.n + byte) % modulus
 
             if byte_index == 0:
-                q_rpi_value_start = FQ.one()
-                rpi_value_lc.append(FQ(byte))
+                q_rpi_value_start = one
+                rpi_value_lc = byte
             else:
-                rpi_value_lc.append(FQ(rpi_value_lc[-1] * byte_pow_base + byte))
+                rpi_value_lc = (rpi_value_lc * byte_pow_base.n + byte) % modulus
 
             if i < BLOCK_LEN // 2 + 1:
                 assert i < len(block_table_value_col)
@@ -956,17 +1019,17 @@ def public_data2witness(
             if i == BLOCK_LEN // 2 + 3:
                 block_table.add(WordOrValue(Word(public_data.state_root_prev)))
 
-            q_tx_table = FQ.zero()
-            q_tx_calldata = FQ.zero()
-            q_tx_calldata_start = FQ.zero()
-            q_withdrawal_table = FQ.zero()
-
-            tx_id_inv = FQ.zero()
-            tx_value_lo_inv = FQ.zero()
-            tx_id_diff_inv = FQ.zero()
-            calldata_gas_cost = FQ.zero()
-            is_final = FQ.zero()
-            tx_row = TxTableRow(FQ.zero(), FQ.zero(), FQ.zero(), WordOrValue(FQ.zero()))
+            q_tx_table = zero
+            q_tx_calldata = zero
+            q_tx_calldata_start = zero
+            q_withdrawal_table = zero
+
+            tx_id_or_tag = zero
+            tx_value_lo = zero
+            tx_id_diff = zero
+            calldata_gas_cost = zero
+            is_final = zero
+            tx_row = empty_tx_row
             tx_table_len = TX_LEN * MAX_TXS + 1
             tx_and_calldata_len = tx_table_len + MAX_CALLDATA_BYTES
             if i < tx_and_calldata_len:
@@ -975,25 +1038,25 @@ def public_data2witness(
                 value = tx_table_cols[2][i]
                 tag = FQ(TxTag.CallData)
                 if i == 0:
-                    tag = FQ.zero()
+                    tag = zero
                 elif i < tx_table_len:
                     # Iterate over TxTag values (until TxTag.TxSignHash) in a cycle
                     tag = FQ((i % TX_LEN))
                     if i % TX_LEN == 0:
                         tag = FQ(TX_LEN)
                 if i < tx_table_len:
-                    q_tx_table = FQ.one()
-                    tx_id_inv = (tag - FQ(TxTag.CallDataLength)).inv()
-                    tx_value_lo_inv = value.lo.expr().inv()
+                    q_tx_table = one
+                    tx_id_or_tag = tag - FQ(TxTag.CallDataLength)
+                    tx_value_lo = value.lo.expr()
 
                 if i >= tx_table_len:
-                    q_tx_calldata = FQ.one()
-                    tx_id_inv = tx_id.inv()
-                    tx_value_lo_inv = value.lo.expr().inv()
-                    tx_id_next = FQ.zero()
+                    q_tx_calldata = one
+                    tx_id_or_tag = tx_id
+                    tx_value_lo = value.lo.expr()
+                    tx_id_next = zero
                     if i < tx_and_calldata_len - 1:
                         tx_id_next = tx_table_cols[0][i + 1]
-                    tx_id_diff_inv = (tx_id_next - tx_id).inv()
+                    tx_id_diff = tx_id_next - tx_id
                     calldata_gas_cost = tx_table_tx_calldata[3][i - tx_table_len]
                     is_final = tx_table_tx_calldata[4][i - tx_table_len]
                     calldata_gas_cost_table.append(
@@ -1001,12 +1064,12 @@ def public_data2witness(
                     )
 
                 if i == tx_table_len:
-                    q_tx_calldata_start = FQ.one()
+                    q_tx_calldata_start = one
                 tx_row = TxTableRow(tx_id, tag, index, value)
                 tx_table.add(tx_id, tag, index, value)
 
             # fill withdrawal table
-            wd_row = WithdrawalTableRow(FQ(0), FQ(0), Word(0), FQ(0))
+            wd_row = empty_wd_row
             if i >= tx_and_calldata_len and i < tx_and_calldata_len + MAX_WITHDRAWALS:
                 j = i - tx_and_calldata_len
                 id = withdrawal_table_cols[0][j]
@@ -1014,7 +1077,7 @@ def public_data2witness(
                 address = withdrawal_table_cols[2][j]
                 amount = withdrawal_table_cols[3][j]
 
-                q_withdrawal_table = FQ(1)
+                q_withdrawal_table = one
                 wd_row = WithdrawalTableRow(id, validator_id, address, amount)
                 withdrawal_table.add(id, validator_id, address, amount)
 
@@ -1025,25 +1088,31 @@ def public_data2witness(
                 q_tx_calldata_start,
                 q_rpi_keccak_lookup,
                 q_rpi_value_start,
-                tx_id_inv,
-                tx_value_lo_inv,
-                tx_id_diff_inv,
+                zero,  # tx_id_inv will be set below
+                zero,  # tx_value_lo_inv will be set below
+                zero,  # tx_id_diff_inv will be set below
                 calldata_gas_cost,
                 is_final,
                 q_withdrawal_table,
                 FQ(rpi_bytes[-1]),
-                rpi_bytes_keccakrlc[-1],
-                rpi_value_lc[-1],
-                Word(0),  # rpi_digest_word will be set below
+                FQ(rpi_bytes_keccakrlc),
+                FQ(rpi_value_lc),
+                empty_word,  # rpi_digest_word will be set below
                 q_rpi_byte_enable,
                 keccak_table,
                 tx_row,
                 wd_row,
             )
             rows.append(row)
+            values_to_invert.append((tx_id_or_tag, tx_value_lo, tx_id_diff))
             i -= 1
     rows.reverse()
-    output_digest = keccak(bytes(rpi_bytes))
+    values_to_invert.reverse()
+    inverses = iter(batch_inv([value for values in values_to_invert for value in values]))
+    for row in rows:
+        row.tx_id_inv, row.tx_value_lo_inv, row.tx_id_diff_inv = islice(inverses, 3)
+    keccak_table.add(bytes(rpi_bytes), keccak_rand)
+    output_digest = keccak256(bytes(rpi_bytes))
     assert len(output_digest) == 32
 
     # keccak lookup happened on 0 row
@@ -1055,8 +1124,6 @@ def public_data2witness(
         state_root=Word(public_data.block.state_root),
         state_root_prev=Word(public_data.state_root_prev),
     )
-    keccak_table.add(bytes(rpi_bytes), keccak_rand)
-
     block_table.table.reverse()
     tx_table.table.reverse()
     withdrawal_table.table.reverse()
@@ -1,7 +1,16 @@
 from typing import List, NamedTuple
-from .util import FQ, RLC, Word, ECDSAVerifyChip, KeccakTable, is_circuit_code
+from .util import (
+    FQ,
+    RLC,
+    Word,
+    ECDSAVerifyChip,
+    ECDSA_VERIFIER,
+    ECDSAVerifier,
+    KeccakTable,
+    is_circuit_code,
+    keccak256,
+)
 from eth_keys import KeyAPI  # type: ignore
-from eth_utils import keccak
 
 
 class Row:
@@ -54,14 +63,20 @@ class Row:
         msg_hash: bytes,
         is_valid: bool = True,
     ):
-        pub_key_hash = keccak(pub_key.to_bytes())
+        pub_key_hash = keccak256(pub_key.to_bytes())
         self_pub_key_hash = pub_key_hash
         self_address = FQ(int.from_bytes(pub_key_hash[-20:], "big"))
         self_msg_hash = Word(int.from_bytes(msg_hash, "big"))
         self_ecdsa_chip = ECDSAVerifyChip.assign(signature, pub_key, msg_hash)
         return cls(self_pub_key_hash, self_address, self_msg_hash, self_ecdsa_chip, is_valid)
 
-    def verify(self, keccak_table: KeccakTable, keccak_randomness: FQ, assert_msg: str):
+    def verify(
+        self,
+        keccak_table: KeccakTable,
+        keccak_randomness: FQ,
+        assert_msg: str,
+        verifier: ECDSAVerifier = ECDSA_VERIFIER,
+    ):
         # 0. Copy constraints between pub_key, msg_hash and signature of this chip
         # and the ones in ECDSA chip
         assert self.pub_key_x_bytes == self.ecdsa_chip.pub_key_x_bytes
@@ -100,7 +115,7 @@ class Row:
         ), f"{assert_msg}: {hex(msg_hash.int_value())} != {hex(self.msg_hash.int_value())}"
 
         # 5. Verify the ECDSA signature
-        is_valid = self.ecdsa_chip.verify()
+        is_valid = self.ecdsa_chip.verify(verifier)
         assert is_valid == self.is_valid, f"{assert_msg}: {is_valid} != {self.is_valid}"
 
 
@@ -113,10 +128,16 @@ class Witness(NamedTuple):
 def verify_circuit(
     witness: Witness,
     keccak_randomness: FQ,
+    verifier: ECDSAVerifier = ECDSA_VERIFIER,
 ) -> None:
     """
-    Entry level circuit verification function
+    Entry level circuit verification function.  The signatures are verified
+    by `verifier`, e.g. one with a process pool for a large batch.
     """
+    # Verify all the signatures at once, so that the ECDSA chips of the rows
+    # only hit the memoized results.
+    verifier.verify_batch([row.ecdsa_chip.request() for row in witness.rows])
+
     for i, row in enumerate(witness.rows):
         assert_msg = f"Constraints failed at row = {i}"
-        row.verify(witness.keccak_table, keccak_randomness, assert_msg)
+        row.verify(witness.keccak_table, keccak_randomness, assert_msg, verifier)
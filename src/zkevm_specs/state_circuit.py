@@ -1,5 +1,19 @@
-from typing import NamedTuple, Tuple, List, Set, Dict, Optional, Union, Mapping
+from typing import (
+    NamedTuple,
+    Tuple,
+    List,
+    Set,
+    Dict,
+    Optional,
+    Union,
+    Mapping,
+    Iterable,
+    Iterator,
+    Sequence,
+)
 from enum import IntEnum
+import heapq
+from functools import lru_cache
 from math import log, ceil
 
 from zkevm_specs.evm_circuit.table import MPTProofType
@@ -13,6 +27,10 @@ from .util import (
     Expression,
     linear_combine_bytes,
     is_circuit_code,
+    keccak256,
+    keccak256_batch,
+    SparseMerkleTree,
+    verify_partitions,
 )
 from .evm_circuit import (
     RW,
@@ -21,7 +39,7 @@ from .evm_circuit import (
     TxLogFieldTag,
     TxReceiptFieldTag,
     MPTTableRow,
-    lookup,
+    MPTTableIndex,
 )
 
 MAX_RW_COUNTER = 2**32 - 1
@@ -79,12 +97,14 @@ class Row(NamedTuple):
     # - keys[3]: field_tag
     # - keys[4,5]: storage_key
     keys: Tuple[FQ, FQ, FQ, FQ, Word]
-    key2_limbs: Tuple[FQ, FQ, FQ, FQ, FQ, # key2 in Little-Endian (limbs in base 2**16)
-                      FQ, FQ, FQ, FQ, FQ]
-    key45_bytes: Tuple[FQ,FQ,FQ,FQ,FQ,FQ,FQ,FQ, # key{4,5} in Little-Endian (limbs in base 2**8)
-                       FQ,FQ,FQ,FQ,FQ,FQ,FQ,FQ,
-                       FQ,FQ,FQ,FQ,FQ,FQ,FQ,FQ,
-                       FQ,FQ,FQ,FQ,FQ,FQ,FQ,FQ]
+    # key2_limbs and key45_bytes are derived lazily from keys[2] and keys[4]
+    # when set to None.
+    key2_limbs: Optional[Tuple[FQ, FQ, FQ, FQ, FQ, # key2 in Little-Endian (limbs in base 2**16)
+                               FQ, FQ, FQ, FQ, FQ]]
+    key45_bytes: Optional[Tuple[FQ,FQ,FQ,FQ,FQ,FQ,FQ,FQ, # key{4,5} in Little-Endian (limbs in base 2**8)
+                                FQ,FQ,FQ,FQ,FQ,FQ,FQ,FQ,
+                                FQ,FQ,FQ,FQ,FQ,FQ,FQ,FQ,
+                                FQ,FQ,FQ,FQ,FQ,FQ,FQ,FQ]]
     value: WordOrValue
     initial_value: WordOrValue
 
@@ -105,6 +125,8 @@ class Row(NamedTuple):
         return self.keys[2]
 
     def address_limbs(self) -> Tuple[FQ, FQ, FQ, FQ, FQ, FQ, FQ, FQ, FQ, FQ]:
+        if self.key2_limbs is None:
+            return _address_limbs(self.address().n)  # type: ignore
         return self.key2_limbs
 
     def field_tag(self) -> FQ:
@@ -149,18 +171,33 @@ class Row(NamedTuple):
         FQ,
         FQ,
     ]:
+        if self.key45_bytes is None:
+            return _storage_key_bytes(self.storage_key().int_value())  # type: ignore
         return self.key45_bytes
 
 
+# The limbs and bytes decompositions are shared between all the rows with the
+# same key, which for most tags is just 0.
+@lru_cache(maxsize=2**16)
+def _address_limbs(address: int) -> Tuple[FQ, ...]:
+    address_bytes = address.to_bytes(20, "little")
+    return tuple([FQ(address_bytes[i] + 2**8 * address_bytes[i + 1]) for i in range(0, 20, 2)])
+
+
+@lru_cache(maxsize=2**16)
+def _storage_key_bytes(storage_key: int) -> Tuple[FQ, ...]:
+    return tuple([FQ(x) for x in storage_key.to_bytes(32, "little")])
+
+
 class Tables:
     """
     Tables used for lookup from the state circuit.
     """
 
-    mpt_table: Set[MPTTableRow]
+    mpt_table: MPTTableIndex
 
     def __init__(self, mpt_table: Set[MPTTableRow]):
-        self.mpt_table = mpt_table
+        self.mpt_table = MPTTableIndex(mpt_table)
 
     def mpt_lookup(
         self,
@@ -172,7 +209,7 @@ class Tables:
         root: Word,
         root_prev: Word,
     ) -> MPTTableRow:
-        query: Mapping[str, Optional[Union[FQ, Expression, Word]]] = {
+        query: Mapping[str, Union[Expression, Word]] = {
             "address": address,
             "proof_type": proof_type,
             "storage_key": storage_key,
@@ -181,7 +218,7 @@ class Tables:
             "root": root,
             "root_prev": root_prev,
         }
-        return lookup(MPTTableRow, self.mpt_table, query)
+        return self.mpt_table.lookup(query)
 
 
 # Boolean Expression builder
@@ -488,8 +525,76 @@ def check_tx_receipt(row: Row, row_prev: Row):
     assert row.root == row_prev.root
 
 
+# Pack all the keys and rw_counter used for the lexicographic ordering into a
+# single integer.  The field ordering is (from most significant to less
+# significant):
+# - tag
+# - id
+# - address
+# - field_tag
+# - storage_key
+# - rw_counter
+#
+# address is RLC encoded, so it doesn't keep the order.  We use the address
+# bytes decomposition instead.  Since we will use a chain of comparison gadgets,
+# we try to merge multiple keys together to reduce the number of required
+# gadgets.
+def pack_keys_rwc(
+    tag: int, id: int, address: int, field_tag: int, storage_key: int, rw_counter: int
+) -> int:
+    assert TAG_BITS + ID_BITS == 2 * 16
+    v = tag
+    v = v * 2**ID_BITS + id  # 2 limbs
+    v = v * 2**ADDRESS_BITS + address  # + 10 limbs = 12 limbs
+    v = v * 2**16 + field_tag  # + 1 limb = 13 limbs
+    v = v * 2**256 + storage_key  # + 16 limbs = 29 limbs
+    v = v * 2**RW_COUNTER_BITS + rw_counter  # + 2 limbs = 31 limbs
+    return v
+
+
+def keys_rwc_in_order(row: Row) -> int:
+    return pack_keys_rwc(
+        row.tag().n,
+        row.id().n,
+        row.address().n,
+        row.field_tag().n,
+        int.from_bytes(map(lambda b: b.n, row.storage_key_bytes()), "little"),
+        row.rw_counter.n,
+    )
+
+
+# Return a list of 16 bit limbs in Little-Endian of the packed keys and
+# rw_counter returned by `keys_rwc_in_order`.
+def keys_rwc_to_limbs_in_order(keys: int) -> List[FQ]:
+    limbs = []
+    for i in range(31):
+        limbs.append(FQ(keys & 0xFFFF))
+        keys = keys >> 16
+    return limbs
+
+
+@is_circuit_code
+def check_lexicographic_order(keys_prev: int, keys: int, row_prev: Row, row: Row):
+    # The packed keys are compared as integers, which is equivalent to the
+    # chain of limb comparisons done by the LowerThanGadget.  The gadget is
+    # only run on failure, and its error is reported with the most
+    # significant limb that differs (None when the keys are equal).
+    if not keys_prev < keys:
+        limbs_prev = keys_rwc_to_limbs_in_order(keys_prev)
+        limbs = keys_rwc_to_limbs_in_order(keys)
+        limb = next((i for i in reversed(range(len(limbs))) if limbs_prev[i] != limbs[i]), None)
+        message = f"keys not in lexicographic order at limb {limb}: {row_prev} >= {row}"
+        try:
+            LowerThanGadget(limbs_prev, limbs).verify()
+        except AssertionError as e:
+            raise AssertionError(message) from e
+        raise AssertionError(message)
+
+
 @is_circuit_code
-def check_state_row(row: Row, row_prev: Row, row_next: Row, tables: Tables):
+def check_state_row(
+    row: Row, row_prev: Row, row_next: Row, tables: Tables, check_order: bool = True
+):
     #
     # Constraints that affect all rows, no matter which Tag they use
     #
@@ -527,10 +632,8 @@ def check_state_row(row: Row, row_prev: Row, row_next: Row, tables: Tables):
     # When in two consecutive rows the keys are equal in a column:
     # - The corresponding keys in the following column must be increasing.
     #
-    # address is RLC encoded, so it doesn't keep the order.  We use the address
-    # bytes decomposition instead.  Since we will use a chain of comparison
-    # gadgets, we try to merge multiple keys together to reduce the number of
-    # required gadgets.
+    # When the whole table is verified with `verify_circuit`, this check is
+    # done once for the entire column and can be skipped here.
 
     # NOTE: the current implementation uses the following order: tag,
     # field_tag, id, address, storage_key, rw_counter.  Some constraints of
@@ -538,36 +641,10 @@ def check_state_row(row: Row, row_prev: Row, row_next: Row, tables: Tables):
     # spec different from the implementation, and plan to update the
     # implementation to follow the spec in the future.
 
-    assert TAG_BITS + ID_BITS == 2 * 16
-
-    # Return a list of 16 bit limbs with all the keys and rw_counter used for
-    # the lexicographic ordering.  The field ordering is (from most significant
-    # to less significant):
-    # - tag
-    # - id
-    # - address
-    # - field_tag
-    # - storage_key
-    # - rw_counter
-    def keys_rwc_to_limbs_in_order(row: Row) -> List[FQ]:
-        v = row.tag().n
-        v = v * 2**ID_BITS + row.id().n  # 2 limbs
-        v = v * 2**ADDRESS_BITS + row.address().n  # + 10 limbs = 12 limbs
-        v = v * 2**16 + row.field_tag().n  # + 1 limb = 13 limbs
-        v = v * (2**32) + int.from_bytes(
-            map(lambda b: b.n, row.storage_key_bytes()), "little"
-        )  # + 16 limbs = 29 limbs
-        v = v * 2**RW_COUNTER_BITS + row.rw_counter.n  # + 2 limbs = 31 limbs
-        limbs = []
-        for i in range(31):
-            limbs.append(FQ(v & 0xFFFF))
-            v = v >> 16
-        return limbs
-
-    limbs_prev = keys_rwc_to_limbs_in_order(row_prev)
-    limbs = keys_rwc_to_limbs_in_order(row)
-    if row.tag() != Tag.Start:
-        LowerThanGadget(limbs_prev, limbs).verify()
+    if check_order and row.tag() != Tag.Start:
+        check_lexicographic_order(
+            keys_rwc_in_order(row_prev), keys_rwc_in_order(row), row_prev, row
+        )
 
     # 0.5. Read consistency
     #
@@ -613,6 +690,96 @@ def check_state_row(row: Row, row_prev: Row, row_next: Row, tables: Tables):
         raise ValueError("Unreachable")
 
 
+def verify_circuit(rows: Iterable[Row], tables: Tables) -> None:
+    """
+    Verify all the rows of the state circuit.  The previous row of the first
+    row and the next row of the last row wrap around the table.
+
+    Rows are consumed as a stream with a window of three rows, packing the
+    sort key of each row only once, so the rows can be generated lazily by
+    `assign_state_circuit_iter`.  The first row is checked last, once the
+    row it wraps around to is known.
+    """
+
+    def check(row: Row, keys: int, row_prev: Row, keys_prev: int, row_next: Row):
+        _check_row(row, keys, row_prev, keys_prev, row_next, tables)
+
+    it = iter(rows)
+    first = next(it, None)
+    if first is None:
+        return
+    first_keys = keys_rwc_in_order(first)
+    second: Optional[Row] = None
+    row_prev, keys_prev = first, first_keys
+    row: Optional[Row] = None
+    keys = 0
+    for row_next in it:
+        keys_next = keys_rwc_in_order(row_next)
+        if row is None:
+            second = row_next
+        else:
+            check(row, keys, row_prev, keys_prev, row_next)
+            row_prev, keys_prev = row, keys
+        row, keys = row_next, keys_next
+
+    if row is None:
+        # Single row table
+        check(first, first_keys, first, first_keys, first)
+        return
+    check(row, keys, row_prev, keys_prev, first)
+    assert second is not None
+    check(first, first_keys, row, keys, second)
+
+
+def verify_circuit_parallel(
+    rows: Sequence[Row],
+    tables: Tables,
+    max_workers: Optional[int] = None,
+    max_partition_size: int = 2**14,
+) -> None:
+    """
+    Verify all the rows of the state circuit like `verify_circuit`, splitting
+    them into partitions that are verified concurrently in a process pool.
+
+    Rows are split at Tag boundaries, and partitions larger than
+    `max_partition_size` are split further.  Each partition is sent with the
+    last row of the previous partition and the first row of the next one, so
+    the transitions between partitions are checked as well.
+    """
+    n = len(rows)
+    if n == 0:
+        return
+    bounds = [0]
+    for idx in range(1, n):
+        if rows[idx].tag() != rows[idx - 1].tag() or idx - bounds[-1] >= max_partition_size:
+            bounds.append(idx)
+    bounds.append(n)
+
+    verify_partitions(
+        _verify_partition,
+        (
+            [rows[start - 1], *rows[start:end], rows[end % n]]
+            for start, end in zip(bounds, bounds[1:])
+        ),
+        (tables,),
+        max_workers,
+    )
+
+
+def _verify_partition(rows: List[Row], tables: Tables):
+    # The first and last rows are the boundary rows of the neighbouring
+    # partitions, and are only used as the previous and next rows.
+    keys = [keys_rwc_in_order(row) for row in rows]
+    for idx in range(1, len(rows) - 1):
+        _check_row(rows[idx], keys[idx], rows[idx - 1], keys[idx - 1], rows[idx + 1], tables)
+
+
+def _check_row(row: Row, keys: int, row_prev: Row, keys_prev: int, row_next: Row, tables: Tables):
+    if row.tag() != Tag.Start:
+        check_lexicographic_order(keys_prev, keys, row_prev, row)
+    check_state_row(row, row_prev, row_next, tables, check_order=False)
+
+
 # State circuit operation superclass
 class Operation(NamedTuple):
     """
@@ -830,13 +997,8 @@ def op2row(op: Operation, root: Word) -> Row:
     tag = FQ(op.tag)
     id = FQ(op.id)
     address = FQ(op.address)
-    address_bytes = op.address.to_bytes(20, "little")
-    address_limbs = tuple(
-        [FQ(address_bytes[i] + 2**8 * address_bytes[i + 1]) for i in range(0, 20, 2)]
-    )
     field_tag = FQ(op.field_tag)
     storage_key = Word(op.storage_key)
-    storage_key_bytes = tuple([FQ(x) for x in op.storage_key.to_bytes(32, "little")])
 
     keys = (tag, id, address, field_tag, storage_key)
 
@@ -848,8 +1010,8 @@ def op2row(op: Operation, root: Word) -> Row:
         rw_counter,
         is_write,
         keys,
-        address_limbs,  # type: ignore
-        storage_key_bytes,  # type: ignore
+        None,  # address limbs are derived lazily
+        None,  # storage key bytes are derived lazily
         value,
         initial_value,
         root,
@@ -857,40 +1019,69 @@ def op2row(op: Operation, root: Word) -> Row:
     )
 
 
+def operation_sort_key(op: Operation) -> int:
+    """
+    Sort key of an Operation, matching the lexicographic ordering of the rows
+    checked by the state circuit.
+    """
+    return pack_keys_rwc(op.tag, op.id, op.address, op.field_tag, op.storage_key, op.rw_counter)
+
+
+def sort_operations(ops: Iterable[Operation]) -> List[Operation]:
+    """
+    Sort Operations in the order expected by `assign_state_circuit`, so that
+    unsorted RW logs from the EVM trace can be used directly.
+    """
+    return sorted(ops, key=operation_sort_key)
+
+
+def merge_operations(shards: Iterable[Iterable[Operation]]) -> Iterator[Operation]:
+    """
+    Merge Operations produced by multiple trace shards, each one already
+    sorted with `sort_operations`, into a single sorted stream.
+    """
+    return heapq.merge(*shards, key=operation_sort_key)
+
+
 # Generate the advice Rows from a list of Operations
 def assign_state_circuit(ops: List[Operation]) -> List[Row]:
-    mpt_updates = _mock_mpt_updates(ops)
-
-    # MPT keys for each Storage and Account row, and None otherwise.
-    mpt_keys = [_mpt_key(op) for op in ops]
-    # MPT updates for each Storage and Account row, and None otherwise.
-    updates = [None if key is None else mpt_updates.get(key) for key in mpt_keys]
-    # root_prev for each Storage and Account row, and None otherwise.
-    roots = [None if update is None else update.root_prev for update in updates]
-
-    # With real mpt updates, the final root would be obtained from the public
-    # input. For _mock_mpt_updates, it's just 3 + 5 * number of MPT updates.
-    final_root = Word(3 + 5 * len(mpt_updates))
-    roots.append(final_root)
-
-    # Fill in the None roots with the first non-None value that comes after it.
-    root: Word = final_root
-    for i in reversed(range(len(roots))):
-        maybe_root = roots[i]
-        if maybe_root is None:
-            roots[i] = root
-        else:
-            root = maybe_root
+    return list(assign_state_circuit_iter(ops, mpt_prestate_from_ops(ops)))
+
+
+def assign_state_circuit_iter(ops: Iterable[Operation], trie: SparseMerkleTree) -> Iterator[Row]:
+    """
+    Generate the advice Rows from a stream of Operations, which must be sorted
+    by (tag, id, address, field_tag, storage_key, rw_counter), starting from
+    the state in `trie`, which is updated in place.  The root of a row is the
+    state root after the MPT update of its key has been applied, which happens
+    at the last access to that key, so a single operation of lookahead is
+    enough to assign the rows in bounded memory.
+    """
+    root = Word(trie.root())
+    for op, update in _mpt_updates(ops, trie):
+        if update is not None:
+            root = update.root
+        yield op2row(op, root)
+
 
-    rows = []
-    for op, maybe_root in zip(ops, roots[1:]):
-        assert maybe_root is not None
-        rows.append(op2row(op, maybe_root))
-    return rows
+def mpt_prestate_from_ops(ops: Iterable[Operation]) -> SparseMerkleTree:
+    """
+    Build the state before the Operations, holding the initial value of every
+    Account and Storage key accessed, in a single batched commit.
+    """
+    mpt_ops = [op for op in ops if _mpt_key(op) is not None]
+    trie_keys = keccak256_batch(_trie_preimage(op) for op in mpt_ops)
+    values: Dict[int, int] = {}
+    for op, trie_key in zip(mpt_ops, trie_keys):
+        values.setdefault(int.from_bytes(trie_key, "big"), op.initial_value.int_value())
+    trie = SparseMerkleTree()
+    trie.update_batch(values)
+    return trie
 
 
 def mpt_table_from_ops(ops: List[Operation]) -> Set[MPTTableRow]:
-    return set(_mock_mpt_updates(ops).values())
+    trie = mpt_prestate_from_ops(ops)
+    return set(update for _, update in _mpt_updates(ops, trie) if update is not None)
 
 
 def _mpt_key(op: Operation) -> Optional[Tuple[FQ, FQ, FQ, FQ]]:
@@ -900,34 +1091,52 @@ def _mpt_key(op: Operation) -> Optional[Tuple[FQ, FQ, FQ, FQ]]:
     return (FQ(op.address), FQ(op.field_tag), storage_key.lo.expr(), storage_key.hi.expr())
 
 
-def _mock_mpt_updates(ops: List[Operation]) -> Dict[Tuple[FQ, FQ, FQ, FQ], MPTTableRow]:
-    # makes fake mpt updates for a list of rows. the state root starts at 3 and
-    # is incremented by 5 for each Account or Storage MPT update.
-    mpt_map = {}
+def _trie_preimage(op: Operation) -> bytes:
+    return (
+        op.address.to_bytes(20, "big")
+        + op.field_tag.to_bytes(1, "big")
+        + op.storage_key.to_bytes(32, "big")
+    )
 
-    root = 3
-    for op in ops:
-        mpt_key = _mpt_key(op)
-        if mpt_key is None or mpt_key in mpt_map:
-            continue
-
-        field_tag = op.field_tag
-        proof_type = MPTProofType.StorageMod  # type warning if None
-        if isinstance(field_tag, AccountFieldTag):
-            proof_type = MPTProofType.from_account_field_tag(field_tag)
-
-        new_root = root + 5
-        if isinstance(op, StartOp):
-            new_root = root
-        mpt_map[mpt_key] = MPTTableRow(
-            FQ(op.address),
-            FQ(proof_type),
-            Word(op.storage_key),
-            Word(new_root),
-            Word(root),
-            Word(op.value.int_value()),
-            Word(op.initial_value.int_value()),
-        )
-        root = new_root
 
-    return mpt_map
+def _trie_key(op: Operation) -> int:
+    return int.from_bytes(keccak256(_trie_preimage(op)), "big")
+
+
+def _mpt_proof_type(op: Operation) -> MPTProofType:
+    # value = 0 means that the leaf doesn't exist, which requires a
+    # non-existing proof.  For accounts, code_hash = 0 is used as the
+    # non-existing account state.
+    is_non_exist = op.value.int_value() == 0 and op.initial_value.int_value() == 0
+    if op.tag == Tag.Storage:
+        return MPTProofType.NonExistingAccountProof if is_non_exist else MPTProofType.StorageMod
+    if is_non_exist and op.field_tag == AccountFieldTag.CodeHash:
+        return MPTProofType.NonExistingAccountProof
+    return MPTProofType.from_account_field_tag(AccountFieldTag(op.field_tag))
+
+
+def _mpt_updates(
+    ops: Iterable[Operation], trie: SparseMerkleTree
+) -> Iterator[Tuple[Operation, Optional[MPTTableRow]]]:
+    # Apply the MPT update of each Account or Storage key at its last access
+    # and pair every operation with the update applied at it, if any.
+    it = iter(ops)
+    op = next(it, None)
+    while op is not None:
+        op_next = next(it, None)
+        mpt_key = _mpt_key(op)
+        update = None
+        if mpt_key is not None and (op_next is None or _mpt_key(op_next) != mpt_key):
+            root_prev = trie.root()
+            root = trie.update(_trie_key(op), op.value.int_value())
+            update = MPTTableRow(
+                FQ(op.address),
+                FQ(_mpt_proof_type(op)),
+                Word(op.storage_key),
+                Word(root),
+                Word(root_prev),
+                Word(op.value.int_value()),
+                Word(op.initial_value.int_value()),
+            )
+        yield op, update
+        op = op_next
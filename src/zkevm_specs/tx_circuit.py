@@ -1,4 +1,4 @@
-from typing import NamedTuple, Tuple, List, Set, Union
+from typing import NamedTuple, Optional, Tuple, List, Union
 from .util import (
     FQ,
     RLC,
@@ -11,10 +11,15 @@ from .util import (
     GAS_COST_TX_CALL_DATA_PER_NON_ZERO_BYTE,
     GAS_COST_TX_CALL_DATA_PER_ZERO_BYTE,
     is_circuit_code,
+    keccak256,
+    keccak256_batch,
+    ECDSA_VERIFIER,
+    ECDSARequest,
+    ECDSAVerifier,
+    KeccakTable,
 )
 from eth_keys import KeyAPI  # type: ignore
 import rlp  # type: ignore
-from eth_utils import keccak
 from .evm_circuit import TxContextFieldTag as Tag
 
 
@@ -35,32 +40,6 @@ class Row:
         self.value = WordOrValue(value)
 
 
-class KeccakTable:
-    # The columns are: (is_enabled, input_rlc, input_len, output)
-    table: Set[Tuple[FQ, FQ, FQ, Word]]
-
-    def __init__(self):
-        self.table = set()
-        self.table.add((FQ(0), FQ(0), FQ(0), Word(0)))  # Add all 0s row
-
-    def add(self, input: bytes, keccak_randomness: FQ):
-        output = keccak(input)
-        self.table.add(
-            (
-                FQ(1),
-                RLC(bytes(reversed(input)), keccak_randomness, n_bytes=64).expr(),
-                FQ(len(input)),
-                Word(output),
-            )
-        )
-
-    def lookup(self, is_enabled: FQ, input_rlc: FQ, input_len: FQ, output: Word, assert_msg: str):
-        assert (is_enabled, input_rlc, input_len, output) in self.table, (
-            f"{assert_msg}: {(is_enabled, input_rlc, input_len, output)} "
-            + "not found in the lookup table"
-        )
-
-
 class WrongFieldInteger:
     """
     Wrong Field arithmetic Integer, representing the implementation at
@@ -144,18 +123,17 @@ class ECDSAVerifyChip:
         self_msg_hash = Secp256k1ScalarField(int.from_bytes(msg_hash, "big"))
         return cls(self_signature, self_pub_key, self_msg_hash)
 
-    def verify(self, assert_msg: str):
+    def request(self) -> ECDSARequest:
         msg_hash = bytes(reversed(self.msg_hash.to_le_bytes()))
         sig_r = int.from_bytes(self.signature[0].to_le_bytes(), "little")
         sig_s = int.from_bytes(self.signature[1].to_le_bytes(), "little")
-        signature = KeyAPI.Signature(vrs=[0, sig_r, sig_s])
-        public_key = KeyAPI.PublicKey(
-            bytes(reversed(self.pub_key[0].to_le_bytes()))
-            + bytes(reversed(self.pub_key[1].to_le_bytes()))
+        pub_key_bytes = bytes(reversed(self.pub_key[0].to_le_bytes())) + bytes(
+            reversed(self.pub_key[1].to_le_bytes())
         )
-        assert KeyAPI().ecdsa_verify(
-            msg_hash, signature, public_key
-        ), f"{assert_msg}: ecdsa_verify failed"
+        return (msg_hash, sig_r, sig_s, pub_key_bytes)
+
+    def verify(self, assert_msg: str, verifier: ECDSAVerifier = ECDSA_VERIFIER):
+        assert verifier.verify(*self.request()), f"{assert_msg}: ecdsa_verify failed"
 
 
 class SignVerifyChip:
@@ -195,14 +173,20 @@ class SignVerifyChip:
         msg_hash: bytes,
         keccak_randomness: FQ,
     ):
-        pub_key_hash = keccak(pub_key.to_bytes())
+        pub_key_hash = keccak256(pub_key.to_bytes())
         self_pub_key_hash = pub_key_hash
         self_address = FQ(int.from_bytes(pub_key_hash[-20:], "big"))
         self_msg_hash = Word(int.from_bytes(msg_hash, "big"))
         self_ecdsa_chip = ECDSAVerifyChip.assign(signature, pub_key, msg_hash)
         return cls(self_pub_key_hash, self_address, self_msg_hash, self_ecdsa_chip)
 
-    def verify(self, keccak_table: KeccakTable, keccak_randomness: FQ, assert_msg: str):
+    def verify(
+        self,
+        keccak_table: KeccakTable,
+        keccak_randomness: FQ,
+        assert_msg: str,
+        verifier: ECDSAVerifier = ECDSA_VERIFIER,
+    ):
         is_not_padding = FQ(1 - (self.address == 0))  # 1 - is_zero(self.address)
 
         # 0. Copy constraints between pub_key and msg_hash bytes of this chip
@@ -240,7 +224,7 @@ class SignVerifyChip:
         ), f"{assert_msg}: {hex(msg_hash.int_value())} != {hex(self.msg_hash.int_value())}"
 
         # 4. Verify the ECDSA signature
-        self.ecdsa_chip.verify(assert_msg)
+        self.ecdsa_chip.verify(assert_msg, verifier)
 
 
 class Witness(NamedTuple):
@@ -255,14 +239,21 @@ def verify_circuit(
     MAX_TXS: int,
     MAX_CALLDATA_BYTES: int,
     keccak_randomness: FQ,
+    verifier: ECDSAVerifier = ECDSA_VERIFIER,
 ) -> None:
     """
-    Entry level circuit verification function
+    Entry level circuit verification function.  The signatures are verified
+    by `verifier`, e.g. one with a process pool for a large block.
     """
 
     rows = witness.rows
     sign_verifications = witness.sign_verifications
     keccak_table = witness.keccak_table
+
+    # Verify all the signatures at once, so that the ECDSA chips of the rows
+    # only hit the memoized results.
+    verifier.verify_batch([chip.ecdsa_chip.request() for chip in sign_verifications])
+
     for tx_index in range(MAX_TXS):
         assert_msg = f"Constraints failed for tx_index = {tx_index}"
         tx_row_index = tx_index * Tag.TxSignHash
@@ -272,7 +263,7 @@ def verify_circuit(
         # SignVerifyChip constraint verification.  Padding txs rows contain
         # 0 in all values.  The SignVerifyChip skips the verification when
         # the caller_address == 0.
-        sign_verifications[tx_index].verify(keccak_table, keccak_randomness, assert_msg)
+        sign_verifications[tx_index].verify(keccak_table, keccak_randomness, assert_msg, verifier)
 
         # 0. Copy constraints using fixed offsets between the tx rows and the SignVerifyChip
         assert rows[caller_addr_index].value.value() == sign_verifications[tx_index].address, (
@@ -329,27 +320,37 @@ def padding_tx(tx_id: int) -> List[Row]:
     ]
 
 
+def tx_sign_data(tx: Transaction, chain_id: U64) -> bytes:
+    """Return the RLP encoding of a transaction that is signed (EIP-155)"""
+    return rlp.encode(
+        [tx.nonce, tx.gas_price, tx.gas, tx.encode_to(), tx.value, tx.data, chain_id, 0, 0]
+    )
+
+
 def tx2witness(
-    index: int, tx: Transaction, chain_id: U64, keccak_randomness: FQ, keccak_table: KeccakTable
+    index: int,
+    tx: Transaction,
+    chain_id: U64,
+    keccak_randomness: FQ,
+    keccak_table: KeccakTable,
+    tx_sign_hash: Optional[bytes] = None,
 ) -> Tuple[List[Row], SignVerifyChip]:
     """
     Generate the witness data for a single transaction: generate the tx table
     rows, insert the pub_key_bytes entry in the keccak_table and assign the
-    SignVerifyChip.
+    SignVerifyChip.  The hash of `tx_sign_data` is computed if not given.
     """
 
-    tx_sign_data = rlp.encode(
-        [tx.nonce, tx.gas_price, tx.gas, tx.encode_to(), tx.value, tx.data, chain_id, 0, 0]
-    )
-    tx_sign_hash = keccak(tx_sign_data)
+    if tx_sign_hash is None:
+        tx_sign_hash = keccak256(tx_sign_data(tx, chain_id))
 
     sig_parity = tx.sig_v - 35 - chain_id * 2
     sig = KeyAPI.Signature(vrs=(sig_parity, tx.sig_r, tx.sig_s))
 
-    pk = sig.recover_public_key_from_msg_hash(tx_sign_hash)
+    pk = ECDSA_VERIFIER.recover(tx_sign_hash, sig)
     pk_bytes = pk.to_bytes()
     keccak_table.add(pk_bytes, keccak_randomness)
-    pk_hash = keccak(pk.to_bytes())
+    pk_hash = keccak256(pk_bytes)
     addr = pk_hash[-20:]
 
     sign_verification = SignVerifyChip.assign(sig, pk, tx_sign_hash, keccak_randomness)
@@ -419,20 +420,25 @@ def txs2witness(
     MAX_TXS: int,
     MAX_CALLDATA_BYTES: int,
     keccak_randomness: FQ,
+    keccak_table: Optional[KeccakTable] = None,
 ) -> Witness:
     """
     Generate the complete witness of the transactions for a fixed size circuit.
+    A keccak_table shared with the other circuits of the block can be passed so
+    that each preimage is hashed only once.
     """
 
     assert len(txs) <= MAX_TXS
 
-    keccak_table = KeccakTable()
+    if keccak_table is None:
+        keccak_table = KeccakTable()
     sign_verifications: List[SignVerifyChip] = []
     tx_fixed_rows: List[Row] = []  # Accumulate fixed rows of each tx
     tx_dyn_rows: List[Row] = []  # Accumulate CallData rows of each tx
-    for index, tx in enumerate(txs):
+    tx_sign_hashes = keccak256_batch(tx_sign_data(tx, chain_id) for tx in txs)
+    for index, (tx, tx_sign_hash) in enumerate(zip(txs, tx_sign_hashes)):
         tx_rows, sign_verification = tx2witness(
-            index, tx, chain_id, keccak_randomness, keccak_table
+            index, tx, chain_id, keccak_randomness, keccak_table, tx_sign_hash
         )
         sign_verifications.append(sign_verification)
         for row in tx_rows:
@@ -4,4 +4,7 @@ from .hash import *
 from .param import *
 from .typing import *
 from .ec import *
+from .ec_validation import *
 from .tables import *
+from .smt import *
+from .parallel import *
@@ -66,6 +66,31 @@ class FQ(bn128.FQ):
 IntOrFQ = Union[int, FQ]
 
 
+def batch_inv(values: Sequence[FQ]) -> List[FQ]:
+    """
+    Invert many field elements with a single field inversion (Montgomery's
+    trick).  Like FQ.inv, the inverse of zero is zero.
+    >>> values = [FQ(3), FQ(0), FQ(7)]
+    >>> assert batch_inv(values) == [value.inv() for value in values]
+    """
+    modulus = FQ.field_modulus
+    # prefix[i] is the product of the non-zero values before i
+    prefix = []
+    acc = 1
+    for value in values:
+        prefix.append(acc)
+        if value.n != 0:
+            acc = acc * value.n % modulus
+    acc_inv = prime_field_inv(acc, modulus)
+    result = [FQ.zero()] * len(values)
+    for idx in reversed(range(len(values))):
+        n = values[idx].n
+        if n != 0:
+            result[idx] = FQ(acc_inv * prefix[idx] % modulus)
+            acc_inv = acc_inv * n % modulus
+    return result
+
+
 class RLC:
     # value in int
     int_value: int
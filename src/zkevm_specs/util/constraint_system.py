@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Iterator, Optional, Sequence, Tuple, TypeVar
 
 from .arithmetic import Expression, FQ, Word
 from .param import MAX_N_BYTES
@@ -72,3 +72,27 @@ class ConstraintSystem:
         assert self.cond is None, "Don't support recursive conditions"
         self.cond = cond
         return self
+
+
+_Row = TypeVar("_Row")
+
+
+def distinct_row_pairs(rows: Sequence[_Row], wrap: bool = False) -> Iterator[Tuple[_Row, _Row]]:
+    """
+    Yield each row with the next one, skipping a pair made of the same row
+    objects as the previous pair, so that a run of shared padding rows is
+    verified once.  With `wrap`, the last row is paired with the first one.
+
+    >>> padding = object()
+    >>> rows = ["a", padding, padding, padding, "b"]
+    >>> assert list(distinct_row_pairs(rows)) == [("a", padding), (padding, padding), (padding, "b")]
+    >>> assert len(list(distinct_row_pairs(rows, wrap=True))) == 4
+    """
+    n = len(rows)
+    checked: Optional[Tuple[_Row, _Row]] = None
+    for i in range(n if wrap else n - 1):
+        row, next_row = rows[i], rows[(i + 1) % n]
+        if checked is not None and row is checked[0] and next_row is checked[1]:
+            continue
+        checked = (row, next_row)
+        yield checked
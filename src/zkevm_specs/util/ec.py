@@ -1,9 +1,11 @@
 from __future__ import annotations
-from typing import Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 from eth_keys import KeyAPI  # type: ignore
 from .arithmetic import FP, FQ
 from py_ecc.bn128 import bn128_curve
-from py_ecc.bn128.bn128_pairing import pairing
+from py_ecc.optimized_bn128 import optimized_pairing
+from py_ecc.fields import optimized_bn128_FQ, optimized_bn128_FQ2, optimized_bn128_FQ12
 from py_ecc.bn128.bn128_curve import add, multiply, eq
 
 
@@ -54,6 +56,125 @@ class Secp256k1ScalarField(WrongFieldInteger):
         WrongFieldInteger.__init__(self, value)
 
 
+# ECDSA verification request: (msg_hash, sig_r, sig_s, pub_key_bytes)
+ECDSARequest = Tuple[bytes, int, int, bytes]
+
+
+def _ecdsa_verify(request: ECDSARequest) -> bool:
+    msg_hash, sig_r, sig_s, pub_key_bytes = request
+    signature = KeyAPI.Signature(vrs=[0, sig_r, sig_s])
+    return KeyAPI().ecdsa_verify(msg_hash, signature, KeyAPI.PublicKey(pub_key_bytes))
+
+
+class ECDSAVerifier:
+    """
+    ECDSA signature verification service shared by the witness generation and
+    the verification of the circuits.  Public keys recovered from (msg_hash,
+    v, r, s) and verification results are memoized, so a signature recovered
+    while assigning the witness is not verified again.  When
+    `min_parallel_batch` is set, the cache misses of a large batch are
+    verified in a process pool reused across batches, which is shut down by
+    `close()` or at the end of a `with` block.
+    """
+
+    max_cache_size: int
+    # Maximum number of processes of the pool, None for the number of CPUs
+    max_workers: Optional[int]
+    # Batches with fewer cache misses are verified in this process, and all
+    # of them are when None
+    min_parallel_batch: Optional[int]
+    # (msg_hash, v, r, s) -> pub_key_bytes
+    recovered: Dict[Tuple[bytes, int, int, int], bytes]
+    # (msg_hash, r, s, pub_key_bytes) -> is_valid
+    verified: Dict[ECDSARequest, bool]
+    # Process pool, started by the first batch large enough and then reused
+    pool: Optional[ProcessPoolExecutor]
+
+    def __init__(
+        self,
+        max_cache_size: int = 2**16,
+        max_workers: Optional[int] = None,
+        min_parallel_batch: Optional[int] = None,
+    ) -> None:
+        self.max_cache_size = max_cache_size
+        self.max_workers = max_workers
+        self.min_parallel_batch = min_parallel_batch
+        self.recovered = {}
+        self.verified = {}
+        self.pool = None
+
+    def _insert(self, cache: Dict, key, value):
+        if len(cache) >= self.max_cache_size:
+            # Evict the oldest entry
+            del cache[next(iter(cache))]
+        cache[key] = value
+
+    def recover(self, msg_hash: bytes, signature: KeyAPI.Signature) -> KeyAPI.PublicKey:
+        key = (bytes(msg_hash), signature.v, signature.r, signature.s)
+        pub_key_bytes = self.recovered.get(key)
+        if pub_key_bytes is None:
+            pub_key_bytes = signature.recover_public_key_from_msg_hash(msg_hash).to_bytes()
+            self._insert(self.recovered, key, pub_key_bytes)
+        return KeyAPI.PublicKey(pub_key_bytes)
+
+    def _cached(self, request: ECDSARequest) -> Optional[bool]:
+        is_valid = self.verified.get(request)
+        if is_valid is not None:
+            return is_valid
+        # A public key recovered from the signature is valid for it
+        msg_hash, sig_r, sig_s, pub_key_bytes = request
+        for v in (0, 1):
+            if self.recovered.get((msg_hash, v, sig_r, sig_s)) == pub_key_bytes:
+                return True
+        return None
+
+    def verify(self, msg_hash: bytes, sig_r: int, sig_s: int, pub_key_bytes: bytes) -> bool:
+        return self.verify_batch([(bytes(msg_hash), sig_r, sig_s, bytes(pub_key_bytes))])[0]
+
+    def verify_batch(self, requests: Sequence[ECDSARequest]) -> List[bool]:
+        """
+        Verify many signatures.  The ones that are not memoized are run in the
+        process pool when there are at least `min_parallel_batch` of them.
+        """
+        results: Dict[ECDSARequest, bool] = {}
+        misses: Dict[ECDSARequest, None] = {}
+        for request in requests:
+            is_valid = self._cached(request)
+            if is_valid is None:
+                misses[request] = None
+            else:
+                results[request] = is_valid
+        if self.min_parallel_batch is None or len(misses) < self.min_parallel_batch:
+            verified = map(_ecdsa_verify, misses)
+        else:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(self.max_workers)
+            verified = self.pool.map(_ecdsa_verify, misses)
+        # The cache may evict some of the results of a large batch, so they
+        # are returned from the results of this batch
+        for request, is_valid in zip(misses, verified):
+            results[request] = is_valid
+            self._insert(self.verified, request, is_valid)
+        return [results[request] for request in requests]
+
+    def close(self):
+        """Shut down the process pool, if it was started"""
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def __enter__(self) -> ECDSAVerifier:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+# Verifier shared by default by all the circuits.  It never starts a process
+# pool: callers that want one pass their own verifier.
+ECDSA_VERIFIER = ECDSAVerifier()
+
+
 # TODO: There is another one used in tx_circuit, try to merge into one.
 #       Reminder: endianness of public key is differ with the one in tx_circuit
 class ECDSAVerifyChip:
@@ -106,15 +227,15 @@ class ECDSAVerifyChip:
         self_msg_hash = Secp256k1ScalarField(int.from_bytes(msg_hash, "big"))
         return cls((self_sig_v, self_sig_r, self_sig_s), self_pub_key, self_msg_hash)
 
-    def verify(self) -> bool:
-        sig_v = int.from_bytes(self.sig_v.to_le_bytes(), "little")
+    def request(self) -> ECDSARequest:
         sig_r = int.from_bytes(self.sig_r.to_le_bytes(), "little")
         sig_s = int.from_bytes(self.sig_s.to_le_bytes(), "little")
-        signature = KeyAPI.Signature(vrs=[sig_v, sig_r, sig_s])
-
         msg_hash = bytes(self.msg_hash.to_be_bytes())
-        public_key = KeyAPI.PublicKey(self.pub_key[0].to_be_bytes() + self.pub_key[1].to_be_bytes())
-        return KeyAPI().ecdsa_verify(msg_hash, signature, public_key)
+        pub_key_bytes = self.pub_key[0].to_be_bytes() + self.pub_key[1].to_be_bytes()
+        return (msg_hash, sig_r, sig_s, pub_key_bytes)
+
+    def verify(self, verifier: ECDSAVerifier = ECDSA_VERIFIER) -> bool:
+        return verifier.verify(*self.request())
 
 
 class ECCVerifyChip:
@@ -190,10 +311,28 @@ class ECCPairingVerifyChip:
         return cls(p, q, output)
 
     def verify_pairing(self) -> bool:
-        result = bn128_curve.FQ12.one()
+        return pairing_check(zip(self.p, self.q))
+
 
-        for p, q in zip(self.p, self.q):
-            p = None if p == (0, 0) else p
-            q = None if q[0] == bn128_curve.FQ2.zero() and q[1] == bn128_curve.FQ2.zero() else q
-            result = result * pairing(q, p)
-        return result == bn128_curve.FQ12.one()
+def pairing_check(
+    pairs: Iterable[Tuple[Tuple[FP, FP], Tuple[bn128_curve.FQ2, bn128_curve.FQ2]]]
+) -> bool:
+    """
+    Return whether the product of the pairings e(p, q) is 1, where (0, 0)
+    represents the point at infinity.  The Miller loops of all the pairs are
+    multiplied in projective coordinates before a single final exponentiation,
+    instead of paying a final exponentiation per pair.
+    """
+    result = optimized_bn128_FQ12.one()
+    for p, q in pairs:
+        if p == (0, 0) or (q[0] == bn128_curve.FQ2.zero() and q[1] == bn128_curve.FQ2.zero()):
+            continue
+        p_proj = (optimized_bn128_FQ(p[0].n), optimized_bn128_FQ(p[1].n), optimized_bn128_FQ.one())
+        q_proj = (
+            optimized_bn128_FQ2([int(c) for c in q[0].coeffs]),
+            optimized_bn128_FQ2([int(c) for c in q[1].coeffs]),
+            optimized_bn128_FQ2.one(),
+        )
+        # the points are checked to be on their curves by pairing
+        result *= optimized_pairing.pairing(q_proj, p_proj, final_exponentiate=False)
+    return optimized_pairing.final_exponentiate(result) == optimized_bn128_FQ12.one()
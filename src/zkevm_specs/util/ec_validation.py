@@ -0,0 +1,70 @@
+from functools import lru_cache
+from typing import Tuple
+from py_ecc.optimized_bn128 import FQ2, b2, eq, field_modulus, is_on_curve, multiply
+
+# Maximum number of points kept by the G1 and G2 validation caches
+EC_VALIDATION_CACHE_SIZE = 2**12
+
+# BN254 is generated by u, with p = 36u^4 + 36u^3 + 24u^2 + 6u + 1 and
+# curve order r = 36u^4 + 36u^3 + 18u^2 + 6u + 1
+BN254_U = 4965661367192848881
+
+# The untwist-Frobenius-twist endomorphism psi acts on G2 as the
+# multiplication by p, which is 6u^2 mod r
+PSI_EIGENVALUE = 6 * BN254_U**2
+# psi(x, y) = (conj(x) * xi^((p - 1) / 3), conj(y) * xi^((p - 1) / 2)) with xi = 9 + i
+PSI_XI = FQ2([9, 1])
+PSI_X_COEFF = PSI_XI ** ((field_modulus - 1) // 3)
+PSI_Y_COEFF = PSI_XI ** ((field_modulus - 1) // 2)
+
+# (x, y) of a G1 point, where (0, 0) represents the point at infinity
+G1Point = Tuple[int, int]
+# ((x.c0, x.c1), (y.c0, y.c1)) of a G2 point, where all 0s represents the point at infinity
+G2Point = Tuple[Tuple[int, int], Tuple[int, int]]
+
+
+def _conj(value: FQ2) -> FQ2:
+    c0, c1 = value.coeffs
+    return FQ2([c0, -c1])
+
+
+def _psi(point: Tuple[FQ2, FQ2, FQ2]) -> Tuple[FQ2, FQ2, FQ2]:
+    # psi is computed on projective coordinates, as conj(z) scales both x and y
+    x, y, z = point
+    return (_conj(x) * PSI_X_COEFF, _conj(y) * PSI_Y_COEFF, _conj(z))
+
+
+@lru_cache(maxsize=EC_VALIDATION_CACHE_SIZE)
+def is_valid_g1(point: G1Point) -> bool:
+    """
+    Return whether a point is in G1.  The cofactor of G1 is 1, so a point on
+    the curve y^2 = x^3 + 3 is in the subgroup and no scalar multiplication by
+    the curve order is needed.
+
+    >>> assert is_valid_g1((1, 2)) and is_valid_g1((0, 0))
+    >>> assert not is_valid_g1((1, 3))
+    """
+    x, y = point
+    if x == 0 and y == 0:
+        return True
+    if x >= field_modulus or y >= field_modulus:
+        return False
+    return (y * y - x * x * x - 3) % field_modulus == 0
+
+
+@lru_cache(maxsize=EC_VALIDATION_CACHE_SIZE)
+def is_valid_g2(point: G2Point) -> bool:
+    """
+    Return whether a point is in G2: it's on the twist curve and psi(Q) ==
+    [6u^2]Q, which holds only in G2.  This needs a 127-bit projective scalar
+    multiplication instead of a 254-bit affine one by the curve order.
+    """
+    (x0, x1), (y0, y1) = point
+    if x0 == 0 and x1 == 0 and y0 == 0 and y1 == 0:
+        return True
+    if any(c >= field_modulus for c in (x0, x1, y0, y1)):
+        return False
+    q = (FQ2([x0, x1]), FQ2([y0, y1]), FQ2.one())
+    if not is_on_curve(q, b2):
+        return False
+    return eq(_psi(q), multiply(q, PSI_EIGENVALUE))
@@ -1,13 +1,106 @@
-from typing import Union
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Union
 from Crypto.Hash import keccak
 
 from .typing import U256
 
+# Maximum number of bytes kept by the keccak256 cache, counting each preimage
+# and KECCAK_CACHE_ENTRY_OVERHEAD for its digest and dict slot, which is ~650
+# contracts of 24KB or ~100k public keys
+KECCAK_CACHE_MAX_BYTES = 2**24
+KECCAK_CACHE_ENTRY_OVERHEAD = 2**7
+
+
+def _keccak256(data: bytes) -> bytes:
+    return keccak.new(data=data, digest_bits=256).digest()
+
+
+class _KeccakCache:
+    """LRU cache of keccak256 digests keyed by their preimage, bounded by bytes"""
+
+    max_bytes: int
+    # preimage -> digest, from the least to the most recently used
+    digests: "OrderedDict[bytes, bytes]"
+    size: int
+    hits: int
+    misses: int
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.clear()
+
+    def clear(self):
+        self.digests = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def digest(self, data: bytes) -> bytes:
+        digest = self.digests.get(data)
+        if digest is not None:
+            self.digests.move_to_end(data)
+            self.hits += 1
+            return digest
+        self.misses += 1
+        digest = _keccak256(data)
+        entry_size = len(data) + KECCAK_CACHE_ENTRY_OVERHEAD
+        if entry_size <= self.max_bytes:
+            self.digests[data] = digest
+            self.size += entry_size
+            while self.size > self.max_bytes:
+                evicted, _ = self.digests.popitem(last=False)
+                self.size -= len(evicted) + KECCAK_CACHE_ENTRY_OVERHEAD
+        return digest
+
+
+_keccak_cache = _KeccakCache(KECCAK_CACHE_MAX_BYTES)
+
+
+def _to_bytes(data: Union[str, bytes, bytearray]) -> bytes:
+    # Mutable inputs are copied, so the cache key can't change after the fact
+    return bytes.fromhex(data) if isinstance(data, str) else bytes(data)
+
 
 def keccak256(data: Union[str, bytes, bytearray]) -> bytes:
-    if isinstance(data, str):
-        data = bytes.fromhex(data)
-    return keccak.new(digest_bits=256).update(data).digest()
+    """
+    Return the keccak256 digest of data.  Digests are cached by content, so
+    hashing the same code, public key or RLP payload again is a dict probe.
+
+    >>> _keccak_cache.clear()
+    >>> code = bytes(KECCAK_CACHE_MAX_BYTES // 2)
+    >>> digest = keccak256(code)
+    >>> assert keccak256(bytearray(code)) == digest
+    >>> (_keccak_cache.hits, _keccak_cache.misses)
+    (1, 1)
+
+    The least recently used digests are evicted once the preimages exceed
+    the cache size.
+
+    >>> assert keccak256(bytes(KECCAK_CACHE_MAX_BYTES // 2) + b"1") != digest
+    >>> assert code not in _keccak_cache.digests
+    >>> _keccak_cache.size <= KECCAK_CACHE_MAX_BYTES
+    True
+    """
+    return _keccak_cache.digest(_to_bytes(data))
+
+
+def keccak256_batch(datas: Iterable[Union[str, bytes, bytearray]]) -> List[bytes]:
+    """
+    Return the keccak256 digests of many inputs, hashing each distinct input
+    once even when the batch doesn't fit in the cache.
+
+    >>> code = bytearray.fromhex("6001")
+    >>> assert keccak256_batch([code, "6001", b""]) == [keccak256(code)] * 2 + [keccak256(b"")]
+    """
+    digests: Dict[bytes, bytes] = {}
+    result = []
+    for data in datas:
+        data = _to_bytes(data)
+        digest = digests.get(data)
+        if digest is None:
+            digest = digests[data] = _keccak_cache.digest(data)
+        result.append(digest)
+    return result
 
 
 EMPTY_HASH: U256 = U256(int.from_bytes(keccak256(""), "big"))
@@ -0,0 +1,32 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterable, Optional, Sequence, Tuple
+
+# Context of the process pool workers (e.g. the lookup tables), sent once when
+# the worker starts instead of with every partition
+_worker_context: Tuple[Any, ...] = ()
+
+
+def _init_worker(context: Tuple[Any, ...]):
+    global _worker_context
+    _worker_context = context
+
+
+def _verify_partition(verify: Callable[..., None], partition: Sequence):
+    verify(partition, *_worker_context)
+
+
+def verify_partitions(
+    verify: Callable[..., None],
+    partitions: Iterable[Sequence],
+    context: Tuple[Any, ...] = (),
+    max_workers: Optional[int] = None,
+):
+    """
+    Call `verify(partition, *context)` on each partition concurrently in a
+    process pool, raising the first error of a partition.  `verify` must be a
+    module level function, so that it can be sent to the workers.
+    """
+    with ProcessPoolExecutor(max_workers, initializer=_init_worker, initargs=(context,)) as pool:
+        futures = [pool.submit(_verify_partition, verify, partition) for partition in partitions]
+        for future in futures:
+            future.result()
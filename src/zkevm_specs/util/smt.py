@@ -0,0 +1,84 @@
+from typing import Dict, Mapping, Tuple
+
+from .hash import _keccak256
+
+SMT_DEPTH = 256
+
+# Hash of an empty subtree, so the root of an empty tree is 0
+EMPTY_NODE = bytes(32)
+
+
+class SparseMerkleTree:
+    """
+    In-memory sparse Merkle tree keyed by 256-bit integers, used as a stand-in
+    of the MPT to produce real state roots for the MPT table.  The leaf of a
+    key holds the hash of its 256-bit value, and a value of 0 represents a
+    non-existing leaf.
+
+    Only the hashes of non-empty nodes are stored, indexed by (height, path
+    prefix), so that an update only recomputes the nodes in its path.  Nodes
+    are hashed without the keccak256 cache, as each node hash is used once.
+
+    >>> trie = SparseMerkleTree()
+    >>> assert trie.root() == 0
+    >>> root = trie.update(1, 10)
+    >>> root = trie.update(2**255, 20)
+    >>> assert SparseMerkleTree().update_batch({1: 10, 2**255: 20}) == root
+    >>> assert trie.update(2**255, 0) == SparseMerkleTree().update(1, 10)
+    """
+
+    # (height, key >> height) -> node hash, for nodes that are not empty
+    nodes: Dict[Tuple[int, int], bytes]
+
+    def __init__(self) -> None:
+        self.nodes = {}
+
+    def root(self) -> int:
+        return int.from_bytes(self._node(SMT_DEPTH, 0), "big")
+
+    def get(self, key: int) -> bytes:
+        """Return the leaf hash of a key"""
+        return self._node(0, key)
+
+    def update(self, key: int, value: int) -> int:
+        """Set the value of a key and return the new root"""
+        self._set_leaf(key, value)
+        for height in range(1, SMT_DEPTH + 1):
+            self._hash_node(height, key >> height)
+        return self.root()
+
+    def update_batch(self, values: Mapping[int, int]) -> int:
+        """
+        Set the values of many keys and return the new root.  Each node shared
+        by the paths of the updated keys is hashed only once.
+        """
+        prefixes = set(values.keys())
+        for key, value in values.items():
+            self._set_leaf(key, value)
+        for height in range(1, SMT_DEPTH + 1):
+            prefixes = {prefix >> 1 for prefix in prefixes}
+            for prefix in prefixes:
+                self._hash_node(height, prefix)
+        return self.root()
+
+    def _node(self, height: int, prefix: int) -> bytes:
+        return self.nodes.get((height, prefix), EMPTY_NODE)
+
+    def _store(self, height: int, prefix: int, node: bytes):
+        if node == EMPTY_NODE:
+            self.nodes.pop((height, prefix), None)
+        else:
+            self.nodes[(height, prefix)] = node
+
+    def _set_leaf(self, key: int, value: int):
+        assert 0 <= key < 2**SMT_DEPTH, "Key must be 256-bit"
+        leaf = EMPTY_NODE if value == 0 else _keccak256(value.to_bytes(32, "big"))
+        self._store(0, key, leaf)
+
+    def _hash_node(self, height: int, prefix: int):
+        left = self._node(height - 1, prefix << 1)
+        right = self._node(height - 1, (prefix << 1) | 1)
+        if left == EMPTY_NODE and right == EMPTY_NODE:
+            self._store(height, prefix, EMPTY_NODE)
+        else:
+            self._store(height, prefix, _keccak256(left + right))
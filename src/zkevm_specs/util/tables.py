@@ -1,33 +1,60 @@
-from typing import Tuple, Set
+from typing import Dict, Tuple, Set
 from .arithmetic import (
     FQ,
     RLC,
     Word,
 )
-from eth_utils import keccak
+from .hash import keccak256
+
+# The columns are: (is_enabled, input_rlc, input_len, output)
+KeccakTableEntry = Tuple[FQ, FQ, FQ, Word]
+
+KECCAK_TABLE_ZERO_ROW: KeccakTableEntry = (FQ(0), FQ(0), FQ(0), Word(0))
 
 
 class KeccakTable:
-    # The columns are: (is_enabled, input_rlc, input_len, output)
-    table: Set[Tuple[FQ, FQ, FQ, Word]]
+    """
+    Keccak oracle shared by the circuits of a block.  Each distinct preimage
+    gets a single row, and the enabled rows are indexed by (input_rlc,
+    input_len) so that a lookup is a single probe instead of a scan of the
+    table.  Digests are memoized by the keccak256 cache.
+    """
+
+    # (input_rlc, input_len) -> outputs of the enabled rows with those inputs
+    index: Dict[Tuple[FQ, FQ], Set[Word]]
+    # (preimage, keccak_randomness) -> row
+    entries: Dict[Tuple[bytes, FQ], KeccakTableEntry]
 
     def __init__(self):
-        self.table = set()
-        self.table.add((FQ(0), FQ(0), FQ(0), Word(0)))  # Add all 0s row
+        self.index = {}
+        self.entries = {}
+
+    @property
+    def table(self) -> Set[KeccakTableEntry]:
+        rows = {KECCAK_TABLE_ZERO_ROW}  # Add all 0s row
+        for (input_rlc, input_len), outputs in self.index.items():
+            rows.update((FQ(1), input_rlc, input_len, output) for output in outputs)
+        return rows
 
-    def add(self, input: bytes, keccak_randomness: FQ):
-        output = keccak(input)
-        self.table.add(
-            (
+    def add(self, input: bytes, keccak_randomness: FQ) -> KeccakTableEntry:
+        input = bytes(input)
+        entry = self.entries.get((input, keccak_randomness))
+        if entry is None:
+            length = len(input)
+            entry = (
                 FQ(1),
-                RLC(bytes(reversed(input)), keccak_randomness, n_bytes=64).expr(),
-                FQ(len(input)),
-                Word(output),
+                RLC(bytes(reversed(input)), keccak_randomness, n_bytes=length).expr(),
+                FQ(length),
+                Word(keccak256(input)),
             )
-        )
+            self.entries[(input, keccak_randomness)] = entry
+            self.index.setdefault((entry[1], entry[2]), set()).add(entry[3])
+        return entry
 
     def lookup(self, is_enabled: FQ, input_rlc: FQ, input_len: FQ, output: Word, assert_msg: str):
-        assert (is_enabled, input_rlc, input_len, output) in self.table, (
-            f"{assert_msg}: {(is_enabled, input_rlc, input_len, output)} "
-            + "not found in the lookup table"
-        )
+        row = (is_enabled, input_rlc, input_len, output)
+        if is_enabled == FQ(1):
+            found = output in self.index.get((input_rlc, input_len), ())
+        else:
+            found = row == KECCAK_TABLE_ZERO_ROW
+        assert found, f"{assert_msg}: {row} not found in the lookup table"
@@ -1,7 +1,8 @@
-from typing import NamedTuple, List, Set, Optional, Union, Mapping, Tuple
+from typing import NamedTuple, List, Set, Optional, Union, Mapping
 from zkevm_specs.evm_circuit.table import (
     MPTProofType,
     MPTTableRow,
+    MPTTableIndex,
     BlockTableRow,
     BlockContextFieldTag,
 )
@@ -11,10 +12,12 @@ from .util import (
     Word,
     Expression,
     is_circuit_code,
+    keccak256,
+    SparseMerkleTree,
+    KeccakTable,
 )
 import rlp  # type: ignore
 from .evm_circuit import lookup
-from eth_utils import keccak
 
 
 class Row:
@@ -49,10 +52,10 @@ class MPTTable:
     MPTTable used for lookup from the withdrawal circuit.
     """
 
-    table: Set[MPTTableRow]
+    table: MPTTableIndex
 
     def __init__(self, mpt_table: Set[MPTTableRow]):
-        self.table = mpt_table
+        self.table = MPTTableIndex(mpt_table)
 
     def mpt_lookup(
         self,
@@ -64,7 +67,7 @@ class MPTTable:
         root: Word,
         root_prev: Word,
     ) -> MPTTableRow:
-        query: Mapping[str, Optional[Union[FQ, Expression, Word]]] = {
+        query: Mapping[str, Union[Expression, Word]] = {
             "address": address,
             "proof_type": proof_type,
             "storage_key": storage_key,
@@ -73,7 +76,7 @@ class MPTTable:
             "root": root,
             "root_prev": root_prev,
         }
-        return lookup(MPTTableRow, self.table, query)
+        return self.table.lookup(query)
 
 
 class BlockTable:
@@ -90,31 +93,29 @@ class BlockTable:
         return lookup(BlockTableRow, self.table, query)
 
 
-class KeccakTable:
-    # The columns are: (is_enabled, input_rlc, input_len, output)
-    table: Set[Tuple[FQ, FQ, FQ, Word]]
-
-    def __init__(self):
-        self.table = set()
-        self.table.add((FQ(0), FQ(0), FQ(0), Word(0)))  # Add all 0s row
-
-    def add(self, input: bytes, keccak_randomness: FQ):
-        output = keccak(input)
-        length = len(input)
-        self.table.add(
-            (
-                FQ(1),
-                RLC(bytes(reversed(input)), keccak_randomness, n_bytes=length).expr(),
-                FQ(length),
-                Word(output),
-            )
-        )
-
-    def lookup(self, is_enabled: FQ, input_rlc: FQ, input_len: FQ, output: Word, assert_msg: str):
-        assert (is_enabled, input_rlc, input_len, output) in self.table, (
-            f"{assert_msg}: {(is_enabled, input_rlc, input_len, output)} "
-            + "not found in the lookup table"
-        )
+def mpt_update(
+    trie: SparseMerkleTree, withdrawal_id: int, validator_id: int, address: int, amount: int
+) -> MPTTableRow:
+    """
+    Insert the hash of a withdrawal into the withdrawal trie, keyed by its id,
+    and return the MPT table row of the update.
+    """
+    encoded_withdrawal_data = rlp.encode([withdrawal_id, validator_id, address, amount])
+    withdrawal_hash = keccak256(encoded_withdrawal_data)
+    root_prev = trie.root()
+    root = trie.update(
+        int.from_bytes(keccak256(withdrawal_id.to_bytes(32, "big")), "big"),
+        int.from_bytes(withdrawal_hash, "big"),
+    )
+    return MPTTableRow(
+        FQ(address),
+        FQ(MPTProofType.WithdrawalMod),
+        Word(withdrawal_id),
+        Word(root),
+        Word(root_prev),
+        Word(withdrawal_hash),
+        Word(0),
+    )
 
 
 class Witness(NamedTuple):
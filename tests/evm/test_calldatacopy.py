@@ -1,4 +1,5 @@
 import pytest
+from dataclasses import replace
 
 from zkevm_specs.evm_circuit import (
     Opcode,
@@ -14,9 +15,12 @@ from zkevm_specs.evm_circuit import (
     RWDictionary,
     CopyCircuit,
     CopyDataTypeTag,
+    LookupUnsatFailure,
+    RW,
+    Target,
 )
 from zkevm_specs.copy_circuit import verify_copy_table
-from zkevm_specs.util import GAS_COST_COPY
+from zkevm_specs.util import FQ, GAS_COST_COPY, WordOrValue
 from common import memory_expansion, memory_word_size, rand_fq, rand_bytes
 
 TX_ID = 13
@@ -162,3 +166,56 @@ def test_calldatacopy(
         tables=tables,
         steps=steps,
     )
+
+
+def test_calldatacopy_memory_mismatch():
+    randomness_keccak = rand_fq()
+    call_data = rand_bytes(32)
+    tx = Transaction(id=TX_ID, call_data=call_data)
+
+    rw_dictionary = RWDictionary(1)
+    copy_circuit = CopyCircuit().copy(
+        randomness_keccak,
+        rw_dictionary,
+        TX_ID,
+        CopyDataTypeTag.TxCalldata,
+        CALL_ID,
+        CopyDataTypeTag.Memory,
+        0,
+        len(call_data),
+        0xA0,
+        len(call_data),
+        call_data,
+    )
+
+    def tables(rws):
+        return Tables(
+            block_table=set(Block().table_assignments()),
+            tx_table=set(tx.table_assignments()),
+            withdrawal_table=set(),
+            bytecode_table=set(),
+            rw_table=set(rws),
+            copy_circuit=copy_circuit.rows,
+        )
+
+    verify_copy_table(copy_circuit, tables(rw_dictionary.rws), randomness_keccak)
+
+    # Write a different byte at the last copied memory address
+    rws = list(rw_dictionary.rws)
+    rws[-1] = replace(rws[-1], value=WordOrValue(FQ((call_data[-1] + 1) % 256)))
+    with pytest.raises(AssertionError):
+        verify_copy_table(copy_circuit, tables(rws), randomness_keccak)
+
+    # The written range has a gap
+    rws = list(rw_dictionary.rws)
+    del rws[len(rws) // 2]
+    with pytest.raises(LookupUnsatFailure):
+        verify_copy_table(copy_circuit, tables(rws), randomness_keccak)
+    with pytest.raises(LookupUnsatFailure):
+        tables(rws).rw_range_lookup(
+            FQ(1), FQ(RW.Write), FQ(Target.Memory), FQ(CALL_ID), FQ(0xA0), len(call_data)
+        )
+    # The calldata range ends past the calldata
+    assert len(tables(rws).tx_calldata_range_lookup(FQ(TX_ID), FQ(0), len(call_data))) == 32
+    with pytest.raises(LookupUnsatFailure):
+        tables(rws).tx_calldata_range_lookup(FQ(TX_ID), FQ(1), len(call_data))
@@ -127,7 +127,6 @@ def test_codecopy(src_addr: U64, dst_addr: U64, length: U64):
         ),
     ]
 
-    src_data = dict([(i, (code.code[i], code.is_code[i])) for i in range(len(code.code))])
     copy_circuit = CopyCircuit().copy(
         randomness_keccak,
         rw_dictionary,
@@ -139,7 +138,8 @@ def test_codecopy(src_addr: U64, dst_addr: U64, length: U64):
         len(code.code),
         dst_addr,
         length,
-        src_data,
+        code.code,
+        src_is_code=code.is_code,
     )
 
     # rw counter post memory writes
@@ -1,4 +1,5 @@
 import pytest
+from dataclasses import replace
 
 from zkevm_specs.evm_circuit import (
     GAS_COST_EXP_PER_BYTE,
@@ -10,11 +11,13 @@ from zkevm_specs.evm_circuit import (
     RWDictionary,
     StepState,
     Tables,
+    exp_steps,
     verify_steps,
 )
-from zkevm_specs.exp_circuit import verify_exp_circuit
+from zkevm_specs.exp_circuit import verify_exp_circuit, verify_exp_table
 from zkevm_specs.util import (
     byte_size,
+    FQ,
     Word,
 )
 
@@ -107,3 +110,34 @@ def test_exp(base_int: int, exponent_int: int):
             ),
         ],
     )
+
+
+def test_exp_repeated_events():
+    exp_circuit = ExpCircuit().add_event(7, 1023, 3).add_event(7, 1023, 10).fill_dummy_events()
+    verify_exp_circuit(exp_circuit)
+
+    steps = exp_steps(7, 1023)
+    first, second = exp_circuit.rows[: len(steps)], exp_circuit.rows[len(steps) : 2 * len(steps)]
+    # each event has its own identifier, but the steps are computed once
+    assert {row.identifier for row in first} == {FQ(3)}
+    assert {row.identifier for row in second} == {FQ(10)}
+    assert all(a.d is b.d for a, b in zip(first, second))
+
+
+def test_exp_dummy_rows():
+    exp_circuit = ExpCircuit(max_exp_steps=2**12).add_event(3, 101, 1).fill_dummy_events()
+    assert len(exp_circuit.rows) == 2**12 * ExpCircuit.OFFSET_INCREMENT
+    assert len({id(row) for row in exp_circuit.rows}) == len(exp_steps(3, 101)) + 1
+    verify_exp_circuit(exp_circuit)
+
+
+def test_exp_table_mismatch():
+    exp_circuit = ExpCircuit().add_event(3, 101, 1).fill_dummy_events()
+    assert verify_exp_table(exp_circuit.rows)
+
+    # a wrong multiplication is caught by the table check, and then located by
+    # the per row verification
+    exp_circuit.rows[2] = replace(exp_circuit.rows[2], d=Word(5), exponentiation=Word(5))
+    assert not verify_exp_table(exp_circuit.rows)
+    with pytest.raises(AssertionError, match="Expected words to be equal"):
+        verify_exp_circuit(exp_circuit)
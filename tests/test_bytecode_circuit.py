@@ -1,3 +1,5 @@
+import dataclasses
+import pytest
 from copy import deepcopy
 
 from zkevm_specs.bytecode_circuit import *
@@ -14,7 +16,9 @@ from common import rand_fq
 
 # Unroll the bytecode
 def unroll(bytecode: bytes, randomness_keccak: FQ) -> UnrolledBytecode:
-    return UnrolledBytecode(bytecode, list(Bytecode(bytearray(bytecode)).table_assignments()))
+    # The rows of the analysis are shared, so the tests modify a copy of them
+    unrolled = unroll_bytecode(bytecode)
+    return UnrolledBytecode(unrolled.bytes, list(unrolled.rows))
 
 
 # Verify the bytecode circuit with the given data
@@ -27,18 +31,10 @@ def verify_rows(bytecodes: Sequence[UnrolledBytecode], rows: Sequence[Row], succ
     push_table = assign_push_table()
     keccak_table = assign_keccak_table(list(map(lambda v: v.bytes, bytecodes)), randomness_keccak)
     exception = None
-    for idx, row in enumerate(rows):
-        try:
-            next_row = rows[(idx + 1) % len(rows)]
-            check_bytecode_row(row, next_row, push_table, keccak_table, randomness_keccak)
-            ok = True
-        except AssertionError as e:
-            if success:
-                print(idx)
-                print(row)
-                print(next_row)
-            exception = e
-            break
+    try:
+        verify_circuit(rows, push_table, keccak_table, randomness_keccak)
+    except AssertionError as e:
+        exception = e
     if success:
         if exception:
             raise exception
@@ -86,6 +82,77 @@ def test_bytecode_empty():
     verify(k, bytecodes, randomness_keccak, True)
 
 
+def test_bytecode_analysis_reuse():
+    code = bytes([Opcode.PUSH1, 0x01, Opcode.ADD, Opcode.PUSH2, 0x02])
+    unrolled = unroll_bytecode(code)
+    assert unroll_bytecode(code).rows is unrolled.rows
+    assert isinstance(unrolled.rows, tuple)
+    analysis = BYTECODE_STORE.analyze(code)
+    assert tuple(Bytecode(bytearray(code)).table_assignments(analysis)) == unrolled.rows
+    # A copy of the rows is assigned byte by byte, with the same result
+    copied = UnrolledBytecode(code, list(unrolled.rows))
+    assert assign_bytecode_circuit(k, [copied, copied], randomness_keccak) == (
+        assign_bytecode_circuit(k, [unrolled, unrolled], randomness_keccak)
+    )
+    verify(k, [unrolled, unrolled], randomness_keccak, True)
+
+    # The is_code bitmap of a new bytecode doesn't need its hash nor its rows
+    code = bytes([Opcode.PUSH2, 0xFE, 0xED, Opcode.JUMPDEST])
+    assert Bytecode(bytearray(code)).is_code == [True, False, False, True]
+    analysis = BYTECODE_STORE.analyze(code)
+    assert analysis._code_hash is None and analysis._rows is None
+    # Rows that are not from an analysis are not analyzed
+    code = bytes([Opcode.PUSH3, 0x01, 0x02, 0x03, Opcode.STOP, 0x42])
+    assign_bytecode_circuit(k, [UnrolledBytecode(code, [])], randomness_keccak)
+    assert code not in BYTECODE_STORE.analyses
+
+
+def test_bytecode_parallel():
+    bytecodes = [
+        unroll(bytes([Opcode.PUSH1, 0x01, Opcode.JUMPDEST] * n), randomness_keccak)
+        for n in range(12)
+    ]
+    rows = assign_bytecode_circuit(k, bytecodes, randomness_keccak)
+    push_table = set(assign_push_table())
+    keccak_table = assign_keccak_table([v.bytes for v in bytecodes], randomness_keccak)
+    verify_circuit_parallel(
+        rows,
+        push_table,
+        keccak_table,
+        randomness_keccak,
+        max_workers=2,
+        min_partition_size=20,
+        max_partition_size=50,
+    )
+
+    # Change a byte in the middle of the last bytecode
+    assert rows[190].tag == BytecodeFieldTag.Byte
+    rows[190] = dataclasses.replace(rows[190], value=FQ(Opcode.PUSH2))
+    with pytest.raises(AssertionError):
+        verify_circuit_parallel(
+            rows,
+            push_table,
+            keccak_table,
+            randomness_keccak,
+            max_workers=2,
+            min_partition_size=20,
+            max_partition_size=50,
+        )
+
+    # An empty table has nothing to verify
+    verify_circuit([], push_table, keccak_table, randomness_keccak)
+    verify_circuit_parallel([], push_table, keccak_table, randomness_keccak)
+
+
+def test_bytecode_padding():
+    rows = assign_bytecode_circuit(k, [], randomness_keccak)
+    assert len(rows) == 2**k
+    assert rows[0].q_first == 1 and rows[-1].q_last == 1
+    # The padding between the boundary rows is a single shared row
+    assert all(row is rows[1] for row in rows[1:-1])
+    verify_rows([], rows, True)
+
+
 def test_bytecode_full():
     bytecodes = [
         unroll(bytes([7] * (2**k - 2)), randomness_keccak),
@@ -1,4 +1,5 @@
 import pytest
+from py_ecc.bn128.bn128_curve import FQ2, G1, G2, b2, is_on_curve
 from common import rand_fq
 from zkevm_specs.ecc_circuit import (
     EcAdd,
@@ -7,7 +8,7 @@ from zkevm_specs.ecc_circuit import (
     verify_circuit,
     EccCircuit,
 )
-from zkevm_specs.util import FQ
+from zkevm_specs.util import FQ, is_valid_g1, is_valid_g2
 
 randomness_keccak = rand_fq()
 
@@ -397,3 +398,18 @@ def test_ecc_pairing(ecc_ops: EcPairing, success: bool):
     for op, success in ecc_ops:
         circuit.append_pairing(op)
         verify(circuit, success)
+
+
+def test_point_validation():
+    g2 = tuple(tuple(c.n for c in coord.coeffs) for coord in G2)
+    assert is_valid_g1((G1[0].n, G1[1].n)) and is_valid_g2(g2)
+    # (1, y) is on the twist curve, but not in G2
+    q = (
+        (1, 0),
+        (
+            18278151005453108793778860132295291098363647455926340152056652516292830556603,
+            5912654199736721486680175016176231956195085055698687135131307249486702594212,
+        ),
+    )
+    assert is_on_curve((FQ2(q[0]), FQ2(q[1])), b2)
+    assert not is_valid_g2(q)
@@ -1,3 +1,4 @@
+import pytest
 from typing import Union, Callable
 from zkevm_specs.pi_circuit import (
     Witness,
@@ -7,7 +8,10 @@ from zkevm_specs.pi_circuit import (
     Block,
     Transaction,
     Withdrawal,
+    FixedU16Table,
+    FixedU16Row,
 )
+from zkevm_specs.evm_circuit import LookupUnsatFailure
 from zkevm_specs.util import FQ, U64, U256, U160, WordOrValue, Word
 import random
 from random import randrange, randbytes
@@ -208,3 +212,35 @@ def test_bad_rand_rpi_state_root_prev_pub():
         witness.public_inputs.state_root_prev = word(123)
 
     override_not_success(override)
+
+
+def test_copy_constraint_section():
+    random.seed(0)
+
+    MAX_TXS = 2
+    MAX_CALLDATA_BYTES = 8
+    MAX_WITHDRAWALS = 2
+
+    public_data = rand_public_data(MAX_TXS - 1, MAX_CALLDATA_BYTES, MAX_WITHDRAWALS)
+    witness = public_data2witness(public_data, MAX_TXS, MAX_CALLDATA_BYTES, MAX_WITHDRAWALS)
+    verify_circuit(witness, MAX_TXS, MAX_CALLDATA_BYTES, MAX_WITHDRAWALS)
+
+    # Copy constraints that are never checked
+    witness.copy_constrains.append(bytes(32))
+    with pytest.raises(AssertionError, match="1 copy constraints left after the withdrawal"):
+        verify_circuit(witness, MAX_TXS, MAX_CALLDATA_BYTES, MAX_WITHDRAWALS)
+    witness.copy_constrains.pop()
+
+    witness.withdrawal_table.table[1].validator_id = FQ(123)
+    # 5 values per withdrawal, the validator_id is the second
+    with pytest.raises(AssertionError, match="mismatch in withdrawal section at offset 6"):
+        verify_circuit(witness, MAX_TXS, MAX_CALLDATA_BYTES, MAX_WITHDRAWALS)
+
+
+def test_fixed_u16_table():
+    table = FixedU16Table()
+    assert table.lookup({"value": FQ(0xFFFF)}) == FixedU16Row(FQ(0xFFFF))
+    for value in [FQ(1 << 16), FQ(-1)]:
+        with pytest.raises(LookupUnsatFailure):
+            table.lookup({"value": value})
+    assert len(table.rows()) == 1 << 16
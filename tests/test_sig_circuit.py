@@ -5,6 +5,7 @@ from zkevm_specs.sig_circuit import *
 from zkevm_specs.util import FQ
 from common import rand_fq
 from zkevm_specs.util import (
+    ECDSAVerifier,
     FQ,
     Word,
     U160,
@@ -49,7 +50,7 @@ def signedData2witness(
     keccak_table = KeccakTable()
     for i, data in enumerate(signed_data):
         sig = KeyAPI.Signature(vrs=(data.sig_v, data.sig_r, data.sig_s))
-        pk = sig.recover_public_key_from_msg_hash(data.msg_hash)
+        pk = ECDSA_VERIFIER.recover(data.msg_hash, sig)
         ecdsa_chip = ECDSAVerifyChip.assign(sig, pk, data.msg_hash)
 
         pk_bytes = pk.to_bytes()
@@ -117,11 +118,59 @@ def test_ecdsa_verify_chip():
     assert ecdsa_chip.verify() == True
 
 
+def test_ecdsa_verifier_batch():
+    msg_hash = b"\xae" * 32
+    requests = []
+    for byte in range(1, 5):
+        sk = keys.PrivateKey(bytes([byte]) * 32)
+        sig = sk.sign_msg_hash(msg_hash)
+        requests.append((msg_hash, sig.r, sig.s, sk.public_key.to_bytes()))
+    # Wrong public key
+    requests.append((msg_hash, requests[0][1], requests[0][2], requests[1][3]))
+    with ECDSAVerifier(max_workers=2, min_parallel_batch=2) as verifier:
+        assert verifier.verify_batch(requests) == [True] * 4 + [False]
+        assert len(verifier.verified) == 5
+        # The pool is reused by the next batch with enough cache misses
+        pool = verifier.pool
+        assert pool is not None
+        swapped = [requests[2][:3] + (requests[3][3],), requests[3][:3] + (requests[2][3],)]
+        assert verifier.verify_batch(requests[:2] + swapped) == [True, True, False, False]
+        assert verifier.pool is pool
+    assert verifier.pool is None
+
+    # The default verifier never starts a pool
+    verifier = ECDSAVerifier()
+    assert verifier.verify_batch(requests) == [True] * 4 + [False]
+    assert verifier.pool is None
+
+    # A batch with more signatures than the cache can hold
+    verifier = ECDSAVerifier(max_cache_size=2)
+    assert verifier.verify_batch(requests[2:]) == [True, True, False]
+    assert len(verifier.verified) == 2
+
+    # A public key recovered from the signature is not verified again
+    verifier = ECDSAVerifier()
+    sk = keys.PrivateKey(b"\x02" * 32)
+    sig = sk.sign_msg_hash(msg_hash)
+    pk = verifier.recover(msg_hash, sig)
+    assert pk == sk.public_key
+    assert verifier.verify(msg_hash, sig.r, sig.s, pk.to_bytes())
+    assert len(verifier.verified) == 0
+
+
 def test_sig_verify():
     witness = gen_witness()
     verify(witness, r)
 
 
+def test_sig_verify_with_pool():
+    witness = gen_witness(4)
+    with ECDSAVerifier(max_workers=2, min_parallel_batch=2) as verifier:
+        verify_circuit(witness, r, verifier)
+        assert verifier.pool is not None
+        assert len(verifier.verified) == 4
+
+
 def test_sig_incorrect_keccak():
     witness = gen_witness()
     # Set empty keccak lookup table
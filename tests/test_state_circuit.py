@@ -1,4 +1,5 @@
 import traceback
+import pytest
 from typing import Union, List
 
 from zkevm_specs.state_circuit import *
@@ -23,18 +24,12 @@ def verify(
     if isinstance(ops_or_rows[0], Operation):
         rows = assign_state_circuit(ops_or_rows)
     ok = True
-    for idx, row in enumerate(rows):
-        row_prev = rows[(idx - 1) % len(rows)]
-        row_next = rows[(idx + 1) % len(rows)]
-        try:
-            check_state_row(row, row_prev, row_next, tables)
-        except AssertionError as e:
-            if success:
-                traceback.print_exc()
-            print(f"row[{(idx-1) % len(rows)}]: {row_prev}")
-            print(f"row[{idx}]: {row}")
-            ok = False
-            break
+    try:
+        verify_circuit(rows, tables)
+    except AssertionError as e:
+        if success:
+            traceback.print_exc()
+        ok = False
     assert ok == success
 
 
@@ -109,6 +104,93 @@ def test_mpt_updates_ok():
     tables = Tables(mpt_table_from_ops(ops))
     verify(ops, tables)
 
+    rows = assign_state_circuit(ops)
+    first_root, last_root = tables.mpt_table.verify_root_chain()
+    assert first_root == rows[0].root
+    assert last_root == rows[-1].root
+
+
+def test_state_streaming_ok():
+    def ops():
+        yield StartOp(rw_counter=1, rw=RW.Read, lexicographic_ordering_selector=0)
+        for i in range(1000):
+            yield MemoryOp(
+                rw_counter=2 * i + 1, rw=RW.Write, call_id=1, mem_addr=i, value=FQ(i % 256)
+            )
+            yield MemoryOp(
+                rw_counter=2 * i + 2, rw=RW.Read, call_id=1, mem_addr=i, value=FQ(i % 256)
+            )
+        yield AccountOp(
+            rw_counter=2001,
+            rw=RW.Write,
+            addr=0x12345678,
+            field_tag=AccountFieldTag.Nonce,
+            value=FQ(1),
+            committed_value=FQ(0),
+        )
+
+    tables = Tables(mpt_table_from_ops(list(ops())))
+    verify_circuit(assign_state_circuit_iter(ops(), mpt_prestate_from_ops(ops())), tables)
+
+
+def test_state_parallel():
+    ops = [StartOp(rw_counter=1, rw=RW.Read, lexicographic_ordering_selector=0)]
+    for i in range(100):
+        ops.append(MemoryOp(rw_counter=i + 1, rw=RW.Write, call_id=1, mem_addr=i, value=FQ(i)))
+    for i in range(10):
+        ops.append(StackOp(rw_counter=i + 101, rw=RW.Write, call_id=1, stack_ptr=i, value=Word(i)))
+    ops.append(
+        AccountOp(
+            rw_counter=111,
+            rw=RW.Write,
+            addr=0x12345678,
+            field_tag=AccountFieldTag.Nonce,
+            value=FQ(1),
+            committed_value=FQ(0),
+        )
+    )
+    tables = Tables(mpt_table_from_ops(ops))
+    rows = assign_state_circuit(ops)
+    verify_circuit_parallel(rows, tables, max_workers=2, max_partition_size=7)
+
+    # Stack pointer jumps by 2 at the boundary of two partitions
+    rows[108] = op2row(
+        StackOp(rw_counter=108, rw=RW.Write, call_id=1, stack_ptr=8, value=Word(7)), rows[108].root
+    )
+    with pytest.raises(AssertionError):
+        verify_circuit_parallel(rows, tables, max_workers=2, max_partition_size=7)
+
+    # An empty table has nothing to verify
+    verify_circuit_parallel([], tables)
+
+
+def test_sort_operations():
+    # fmt: off
+    ops = [
+        StartOp(rw_counter=1, rw=RW.Read, lexicographic_ordering_selector=0),
+        MemoryOp(rw_counter=2, rw=RW.Write, call_id=1, mem_addr=0, value=FQ(42)),
+        MemoryOp(rw_counter=3, rw=RW.Read,  call_id=1, mem_addr=0, value=FQ(42)),
+        MemoryOp(rw_counter=1, rw=RW.Write, call_id=1, mem_addr=1, value=FQ(7)),
+        StackOp(rw_counter=4, rw=RW.Write, call_id=1, stack_ptr=1022, value=Word(4321)),
+        StorageOp(rw_counter=7, rw=RW.Read,  tx_id=1, addr=0x12345678, key=2 << 250, value=Word(789), committed_value=Word(789)),
+        StorageOp(rw_counter=8, rw=RW.Write, tx_id=1, addr=0x12345679, key=0x4959, value=Word(38491), committed_value=Word(98765)),
+        AccountOp(rw_counter=12, rw=RW.Write, addr=0x12345678, field_tag=AccountFieldTag.Nonce, value=FQ(1), committed_value=FQ(0)),
+        AccountOp(rw_counter=13, rw=RW.Read,  addr=0x12345678, field_tag=AccountFieldTag.Balance, value=Word(3), committed_value=Word(0)),
+    ]
+    # fmt: on
+    shuffled = ops[::-1]
+    assert sort_operations(shuffled) == ops
+    # k-way merge of sorted shards
+    shards = [
+        sort_operations(shuffled[0::3]),
+        sort_operations(shuffled[1::3]),
+        sort_operations(shuffled[2::3]),
+    ]
+    assert list(merge_operations(shards)) == ops
+
+    tables = Tables(mpt_table_from_ops(ops))
+    verify(sort_operations(shuffled), tables)
+
 
 def test_state_bad_key2():
     # fmt: off
@@ -194,6 +276,11 @@ def test_state_keys_non_lexicographic_order():
     tables = Tables(mpt_table_from_ops(ops))
     verify(ops, tables, success=False)
 
+    # The per-row check detects the wrong order as well
+    rows = assign_state_circuit(ops)
+    with pytest.raises(AssertionError, match="keys not in lexicographic order at limb 29"):
+        check_state_row(rows[2], rows[1], rows[0], tables)
+
 
 def test_state_bad_rwc():
     # fmt: off
@@ -151,6 +151,20 @@ def gen_valid_witness() -> Tuple[Witness, U64, int, int]:
     return witness, U64(chain_id), MAX_TXS, MAX_CALLDATA_BYTES
 
 
+def test_shared_keccak_table():
+    witness, chain_id, MAX_TXS, MAX_CALLDATA_BYTES = gen_valid_witness()
+    keccak_table = KeccakTable()
+    txs = [gen_tx(i, keys.PrivateKey(bytes([i + 1]) * 32), 0x1234, chain_id) for i in range(3)]
+    txs2witness(txs, chain_id, MAX_TXS, MAX_CALLDATA_BYTES, r, keccak_table)
+    entries = dict(keccak_table.entries)
+    # A second circuit sharing the table doesn't add rows for the same preimages
+    witness = txs2witness(txs[:2], chain_id, MAX_TXS, MAX_CALLDATA_BYTES, r, keccak_table)
+    assert keccak_table.entries == entries
+    assert witness.keccak_table is keccak_table
+    assert len(keccak_table.table) == len(txs) + 1
+    verify(witness, MAX_TXS, MAX_CALLDATA_BYTES, chain_id, r)
+
+
 def test_bad_keccak():
     witness, chain_id, MAX_TXS, MAX_CALLDATA_BYTES = gen_valid_witness()
     # Set empty keccak lookup table
@@ -1,7 +1,8 @@
+import pytest
 from typing import List, Tuple
 import rlp  # type: ignore
 from zkevm_specs.withdrawal_circuit import *
-from zkevm_specs.util import FQ, U64, U160, U256
+from zkevm_specs.util import FQ, U64, U160, U256, SparseMerkleTree
 from random import randrange
 from eth_utils import keccak
 from common import rand_fq
@@ -29,8 +30,7 @@ def withdrawal2witness(
     keccak_table: KeccakTable,
     keccak_randomness: FQ,
     mpt_table_set: set,
-    root: U256,
-    prev_root: U256,
+    trie: SparseMerkleTree,
 ) -> Row:
     """
     Generate the witness data for a single withdrawal: generate the withdrawal table rows
@@ -45,8 +45,8 @@ def withdrawal2witness(
     )
     keccak_table.add(encoded_withdrawal_data, keccak_randomness)
 
-    mpt_table_row = mock_mpt_update(
-        withdrawal.id, withdrawal.validator_id, withdrawal.address, withdrawal.amount, prev_root
+    mpt_table_row = mpt_update(
+        trie, withdrawal.id, withdrawal.validator_id, withdrawal.address, withdrawal.amount
     )
     mpt_table_set.add(mpt_table_row)
 
@@ -56,7 +56,7 @@ def withdrawal2witness(
         FQ(withdrawal.address),
         FQ(withdrawal.amount),
         Word(bytes(keccak(encoded_withdrawal_data))),
-        Word(root),
+        mpt_table_row.root,
     )
 
 
@@ -77,11 +77,13 @@ def withdrawals2witness(
     keccak_table = KeccakTable()
     mpt_table_set = set()
     block_table_set = set()
+    trie = SparseMerkleTree()
 
     for withdrawal, root in zip(withdrawals, mpt_roots):
         withdrawal_row = withdrawal2witness(
-            withdrawal, keccak_table, keccak_randomness, mpt_table_set, root, last_root
+            withdrawal, keccak_table, keccak_randomness, mpt_table_set, trie
         )
+        assert withdrawal_row.root == Word(root)
 
         last_root = root
         rows.append(withdrawal_row)
@@ -122,45 +124,23 @@ def verify(
         assert exception is not None
 
 
-# makes fake mpt updates for a list of rows.
-# the withdrawal root is incremented by 5 for each MPT update.
-def mock_mpt_update(
-    id: U64, validator_id: U64, address: U160, amount: U64, prev_root: int
-) -> MPTTableRow:
-    encoded_withdrawal = rlp.encode([id, validator_id, address, amount])
-    withdrawal_hash = keccak(encoded_withdrawal)
-    root = prev_root + 5
-    return MPTTableRow(
-        FQ(address),
-        FQ(MPTProofType.WithdrawalMod),
-        Word(id),
-        Word(root),
-        Word(prev_root),
-        Word(withdrawal_hash),
-        Word(0),
-    )
-
-
 def gen_withdrawals(num: int) -> Tuple[List[Withdrawal], List[U256]]:
     withdrawal_id = U64(randrange(0, 2**64))
 
     withdrawals = []
     roots = []
-    mpt_table = set()
-    prev_root: int = 0
+    trie = SparseMerkleTree()
     for i in range(num):
         validator_id = U64(randrange(0, 2**64))
         address = U160(randrange(1, 2**160))
         amount = U64(randrange(1, 2**64))
-        mpt_table_row: MPTTableRow = mock_mpt_update(
-            withdrawal_id + i, validator_id, address, amount, prev_root
+        mpt_table_row: MPTTableRow = mpt_update(
+            trie, withdrawal_id + i, validator_id, address, amount
         )
         withdrawal = Withdrawal(withdrawal_id + i, validator_id, address, amount)
 
         withdrawals.append(withdrawal)
         roots.append(mpt_table_row.root.int_value())
-        mpt_table.add(mpt_table_row)
-        prev_root = mpt_table_row.root.int_value()
 
     return withdrawals, roots
 
@@ -230,3 +210,19 @@ def test_withdrawal_inconsistent_amount():
     witness = withdrawals2witness(withdrawals, MAX_WITHDRAWALS, mpt_roots, r)
     witness.rows[0].amount = 10
     verify(witness, MAX_WITHDRAWALS, r, success=False)
+
+
+def test_withdrawal_mpt_root_chain():
+    MAX_WITHDRAWALS = 5
+
+    withdrawals, mpt_roots = gen_withdrawals(MAX_WITHDRAWALS)
+    witness = withdrawals2witness(withdrawals, MAX_WITHDRAWALS, mpt_roots, r)
+    first_root, last_root = witness.mpt_table.table.verify_root_chain()
+    assert first_root == Word(0)
+    assert last_root == Word(mpt_roots[-1])
+
+    # Drop an update in the middle of the chain
+    rows = set(witness.mpt_table.table.rows)
+    rows.remove(next(row for row in rows if row.root == Word(mpt_roots[2])))
+    with pytest.raises(AssertionError, match="single chain"):
+        MPTTable(rows).table.verify_root_chain()